@@ -0,0 +1,356 @@
+"""
+Shared PDB parsing helpers for the tools in this directory.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from functools import lru_cache
+
+PAGE_SIZE = 4096
+HEAP_START = 0x28
+
+# Bound unpackers, so the primitive readers skip the attribute lookup
+_unpack_u16 = struct.Struct('<H').unpack_from
+_unpack_u32 = struct.Struct('<I').unpack_from
+
+# Row group: 16 u16 row offsets, u16 presence flags, u16 unknown
+ROW_GROUP_SIZE = 36
+ROW_GROUP_WORDS = ROW_GROUP_SIZE // 2
+ROW_GROUP = struct.Struct(f'<{ROW_GROUP_WORDS}H')
+# A full group of 16 rows, the common case, in a single unpack call
+_unpack_full_group = ROW_GROUP.unpack_from
+
+# Page header: 0x04..0x28, skipping the unused u32 at 0x14
+PAGE_HEADER = struct.Struct('<4xIIII4xBBBBHHHHHH')
+PAGE_HEADER_FIELDS = (
+    "page_index", "type", "next_page", "unknown1",
+    "num_rows_small", "unknown3", "unknown4", "page_flags",
+    "free_size", "used_size", "unknown5", "num_rows_large", "unknown6", "unknown7",
+)
+
+# Whole 0x28-byte page header, every field
+FULL_PAGE_HEADER = struct.Struct('<IIIIIIBBBBHHHHHH')
+FULL_PAGE_HEADER_FIELDS = (
+    "padding", "page_index", "type", "next_page", "unknown1", "unknown2",
+    "num_rows_small", "unknown3", "unknown4", "page_flags",
+    "free_size", "used_size", "unknown5", "num_rows_large", "unknown6", "unknown7",
+)
+
+def build_struct(fields, size):
+    """Build a little-endian Struct from (offset, code, name) fields, padding gaps"""
+    fmt = '<'
+    pos = 0
+    for off, code, _ in sorted(fields):
+        if off > pos:
+            fmt += f'{off - pos}x'
+        fmt += code
+        pos = off + struct.calcsize('<' + code)
+    if size > pos:
+        fmt += f'{size - pos}x'
+    return struct.Struct(fmt)
+
+# Track row fixed header (0x00..0x5e)
+TRACK_HEADER_FIELDS = (
+    (0x00, 'H', "subtype"),
+    (0x02, 'H', "index_shift"),
+    (0x04, 'I', "bitmask"),
+    (0x08, 'I', "sample_rate"),
+    (0x0c, 'I', "composer_id"),
+    (0x10, 'I', "file_size"),
+    (0x14, 'I', "u2"),
+    (0x18, 'H', "u3"),
+    (0x1a, 'H', "u4"),
+    (0x1c, 'I', "artwork_id"),
+    (0x20, 'I', "key_id"),
+    (0x24, 'I', "original_artist_id"),
+    (0x28, 'I', "label_id"),
+    (0x2c, 'I', "remixer_id"),
+    (0x30, 'I', "bitrate"),
+    (0x34, 'I', "track_number"),
+    (0x38, 'I', "tempo"),
+    (0x3c, 'I', "genre_id"),
+    (0x40, 'I', "album_id"),
+    (0x44, 'I', "artist_id"),
+    (0x48, 'I', "id"),
+    (0x4c, 'H', "disc_number"),
+    (0x4e, 'H', "play_count"),
+    (0x50, 'H', "year"),
+    (0x52, 'H', "sample_depth"),
+    (0x54, 'H', "duration"),
+    (0x56, 'H', "u5"),
+    (0x58, 'B', "color_id"),
+    (0x59, 'B', "rating"),
+    (0x5a, 'H', "file_type"),
+    (0x5c, 'H', "u7"),
+)
+TRACK_HEADER = build_struct(TRACK_HEADER_FIELDS, 0x5e)
+TrackHeader = namedtuple('TrackHeader', [name for _, _, name in TRACK_HEADER_FIELDS])
+
+# 21 u16 string offsets following the track header
+STRING_OFFSETS_POS = 0x5e
+STRING_OFFSETS_COUNT = 21
+
+# madvise() advice values, None where the platform has no madvise
+MADV_RANDOM = getattr(mmap, 'MADV_RANDOM', None)
+MADV_SEQUENTIAL = getattr(mmap, 'MADV_SEQUENTIAL', None)
+MADV_WILLNEED = getattr(mmap, 'MADV_WILLNEED', None)
+
+def _advise(mm, advice):
+    """Pass an access pattern hint to the kernel where madvise is supported"""
+    if advice is not None and hasattr(mm, 'madvise'):
+        mm.madvise(advice)
+
+def open_pdb(path, advice=None, hint_pages=()):
+    """Memory-map a PDB file read-only
+
+    advice is one of the MADV_* values above and defaults to MADV_RANDOM.
+    hint_pages lists pages the caller is about to read; the kernel is asked
+    to prefetch them so scattered reads do not fault in one by one. An empty
+    file raises ValueError, as there is nothing to map.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if os.fstat(fd).st_size == 0:
+            raise ValueError(f"{path}: empty file, nothing to map")
+        if hasattr(os, 'posix_fadvise'):
+            for p in hint_pages:
+                os.posix_fadvise(fd, p * PAGE_SIZE, PAGE_SIZE, os.POSIX_FADV_WILLNEED)
+        mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+    _advise(mm, MADV_RANDOM if advice is None else advice)
+    return mm
+
+def open_pdb_populated(path):
+    """Memory-map a PDB file read-only with every page faulted in up front
+
+    For tools that compare two whole files: MAP_POPULATE (Linux) maps the
+    file in one pass instead of taking a fault per page touched. Elsewhere
+    the whole range is advised WILLNEED instead.
+    """
+    if not hasattr(mmap, 'MAP_POPULATE'):
+        mm = open_pdb(path)
+        _advise(mm, MADV_WILLNEED)
+        return mm
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if os.fstat(fd).st_size == 0:
+            raise ValueError(f"{path}: empty file, nothing to map")
+        return mmap.mmap(fd, 0, flags=mmap.MAP_SHARED | mmap.MAP_POPULATE,
+                         prot=mmap.PROT_READ)
+    finally:
+        os.close(fd)
+
+def read_u16(data, offset):
+    return _unpack_u16(data, offset)[0]
+
+def read_u32(data, offset):
+    return _unpack_u32(data, offset)[0]
+
+def read_u16_array(data, offset, count):
+    """Read count little-endian u16 values as an unboxed array"""
+    arr = array('H')
+    arr.frombytes(data[offset:offset + count * 2])
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+def hex_bytes(data, start, length):
+    return data[start:start + length].hex(' ')
+
+def byte_diffs(a, b):
+    """List (offset, a_byte, b_byte) for each differing byte of two equal-length buffers
+
+    The buffers are compared a machine word at a time; only words that
+    differ are looked at byte by byte.
+    """
+    n = len(a) & ~7
+    diffs = []
+    with memoryview(a) as va, memoryview(b) as vb:
+        words_a = va[:n].cast('Q')
+        words_b = vb[:n].cast('Q')
+        for w, (x, y) in enumerate(zip(words_a, words_b)):
+            if x != y:
+                base = w * 8
+                diffs.extend((base + j, p, q) for j, (p, q)
+                             in enumerate(zip(va[base:base + 8], vb[base:base + 8])) if p != q)
+        diffs.extend((i, a[i], b[i]) for i in range(n, len(a)) if a[i] != b[i])
+    return diffs
+
+def differing_pages(a, b, num_pages, span=64):
+    """Set of page indices below num_pages whose bytes differ between a and b
+
+    Runs of span pages are compared in one go first, so identical stretches
+    of the files cost a single memcmp each.
+    """
+    diff = set()
+    for first in range(0, num_pages, span):
+        last = min(first + span, num_pages)
+        if a[first * PAGE_SIZE:last * PAGE_SIZE] == b[first * PAGE_SIZE:last * PAGE_SIZE]:
+            continue
+        diff.update(p for p in range(first, last)
+                    if a[p * PAGE_SIZE:(p + 1) * PAGE_SIZE] != b[p * PAGE_SIZE:(p + 1) * PAGE_SIZE])
+    return diff
+
+@lru_cache(maxsize=None)
+def set_bits(flags):
+    """Positions of the set bits in a 16-bit row group presence mask"""
+    return tuple(i for i in range(16) if flags >> i & 1)
+
+def get_row_offsets(data, page_offset, num_rows):
+    if num_rows == 0:
+        return []
+
+    num_groups = (num_rows + 15) // 16
+    group_area_start = page_offset + PAGE_SIZE - (num_groups * ROW_GROUP_SIZE)
+    words = read_u16_array(data, group_area_start, num_groups * ROW_GROUP_WORDS)
+
+    offsets = []
+    for g in range(0, len(words), ROW_GROUP_WORDS):
+        # 16 offsets (stored last row first), then the presence flags
+        offsets.extend(words[g + 15 - i] for i in set_bits(words[g + 16]))
+        if len(offsets) >= num_rows:
+            break
+
+    return offsets[:num_rows]
+
+def packed_row_groups(data, page_offset, num_rows):
+    """Parse row groups sized to their rows as (offsets, flags, unknown) tuples
+
+    Each group holds only its rows' offsets, stored last slot first, ahead
+    of its flags and unknown words; group 0 ends at the end of the page and
+    the rest are stacked in front of it. Offsets come back in slot order.
+    """
+    groups = []
+    group_offset = page_offset + PAGE_SIZE
+    for first_row in range(0, num_rows, 16):
+        rows_in_group = min(16, num_rows - first_row)
+        group_offset -= rows_in_group * 2 + 4
+        if group_offset < page_offset:
+            break
+        if rows_in_group == 16:
+            words = _unpack_full_group(data, group_offset)
+        else:
+            words = read_u16_array(data, group_offset, rows_in_group + 2)
+        groups.append((list(words[rows_in_group - 1::-1]), words[-2], words[-1]))
+    return groups
+
+class PDB:
+    """A memory-mapped PDB file that caches page copies and row offsets"""
+
+    def __init__(self, path, advice=None, hint_pages=()):
+        self.data = open_pdb(path, advice, hint_pages)
+        self._pages = {}
+        self._row_offsets = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.data)
+
+    def close(self):
+        self.data.close()
+
+    def page(self, page_idx):
+        """Local bytes copy of one page"""
+        page = self._pages.get(page_idx)
+        if page is None:
+            offset = page_idx * PAGE_SIZE
+            page = self._pages[page_idx] = self.data[offset:offset + PAGE_SIZE]
+        return page
+
+    def row_offsets(self, page_idx):
+        """Heap-relative row offsets of one page, decoded once"""
+        offsets = self._row_offsets.get(page_idx)
+        if offsets is None:
+            page = self.page(page_idx)
+            offsets = self._row_offsets[page_idx] = get_row_offsets(page, 0, page[0x18])
+        return offsets
+
+def _string_kind(header):
+    if header & 0x01:
+        # Length without null; may be -1 for a bare header
+        return "ShortASCII", 'ascii', (header >> 1) - 1
+    if header == 0x40:
+        return "LongASCII", 'ascii', None
+    if header == 0x90:
+        return "UTF-16", 'utf-16-le', None
+    return "Unknown", None, None
+
+# DeviceSQL header byte -> (encoding, codec, short length)
+STRING_KINDS = tuple(_string_kind(b) for b in range(256))
+
+def _string_span(data, offset):
+    """Locate a DeviceSQL string: (encoding, codec, start, end, total_bytes)"""
+    encoding, codec, length = STRING_KINDS[data[offset]]
+
+    if length is not None:  # ShortASCII
+        # Check for trailing null (sometimes present, sometimes not)
+        total = 1 + length
+        if offset + total < len(data) and data[offset + total] == 0:
+            total += 1  # Include trailing null in total
+        return encoding, codec, offset + 1, offset + 1 + length, total
+
+    if codec is not None:  # Long ASCII or UTF-16
+        total = read_u16(data, offset + 1)  # Length includes 4-byte header
+        return encoding, codec, offset + 4, offset + total, total
+
+    return encoding, None, offset, offset, 1
+
+def _decode_batch(chunks, codec):
+    """Decode many byte strings with one codec call, falling back per chunk"""
+    raw_sep = '\x00'.encode(codec)
+    width = len(raw_sep)
+    if all(len(c) % width == 0 and raw_sep not in c for c in chunks):
+        parts = raw_sep.join(chunks).decode(codec, errors='replace').split('\x00')
+        if len(parts) == len(chunks):
+            return parts
+    return [c.decode(codec, errors='replace') for c in chunks]
+
+def parse_device_sql_strings(data, offsets):
+    """Parse DeviceSQL strings at many offsets, decoding each encoding in one batch
+
+    Returns a list of (decoded_string, total_bytes, encoding), one per offset.
+    total_bytes covers the header and any trailing null; an unknown header
+    byte gives a "<unknown header ...>" placeholder, 1 byte long.
+    """
+    results = [None] * len(offsets)
+    pending = {'ascii': [], 'utf-16-le': []}
+
+    # Pass 1: classify headers and record content spans
+    for idx, offset in enumerate(offsets):
+        encoding, codec, start, end, total = _string_span(data, offset)
+        if codec is None:
+            results[idx] = (f"<unknown header {data[offset]:#x}>", total, encoding)
+            continue
+        results[idx] = (total, encoding)
+        pending[codec].append((idx, data[start:end]))
+
+    # Pass 2: decode each encoding bucket at once
+    for codec, items in pending.items():
+        if not items:
+            continue
+        decoded = _decode_batch([raw for _, raw in items], codec)
+        for (idx, _), content in zip(items, decoded):
+            results[idx] = (content,) + results[idx]
+
+    return results
+
+# ShortASCII header byte for each content length: ((len + 1) << 1) | 1
+_SHORT_STRING_HEADERS = tuple(bytes((((n + 1) << 1) | 1,)) for n in range(127))
+
+def encode_short_string(s):
+    """Encode a short ASCII string in DeviceSQL format"""
+    b = s.encode('utf-8') if isinstance(s, str) else s
+    if len(b) > 126:
+        raise ValueError(f"String too long for short format: {len(b)}")
+    return _SHORT_STRING_HEADERS[len(b)] + b
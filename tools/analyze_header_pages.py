@@ -3,69 +3,71 @@
 Analyze header page content after the 40-byte page header.
 """
 
-import struct
-from pathlib import Path
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
-PAGE_SIZE = 4096
-HEADER_SIZE = 0x28
-
-def read_u8(data, offset):
-    return data[offset]
-
-def read_u16(data, offset):
-    return struct.unpack_from('<H', data, offset)[0]
+from _pdb_common import MADV_SEQUENTIAL, PAGE_SIZE, hex_bytes, open_pdb, read_u32
 
-def read_u32(data, offset):
-    return struct.unpack_from('<I', data, offset)[0]
-
-def hex_bytes(data, start, length):
-    return ' '.join(f'{data[start + i]:02x}' for i in range(min(length, len(data) - start)))
+HEADER_SIZE = 0x28
 
-def analyze_header_pages(pdb_path):
+def analyze_header_pages(pdb_path, out=sys.stdout):
     """Check header pages for extra content"""
-    data = Path(pdb_path).read_bytes()
-
-    # Header pages (based on TABLE_LAYOUTS)
-    header_pages = [1, 3, 5, 7, 9, 11, 13, 15, 17, 19, 21, 23, 25, 27, 29, 31, 33, 35, 37, 39]
-
-    table_names = {
-        0: "Tracks", 1: "Genres", 2: "Artists", 3: "Albums", 4: "Labels",
-        5: "Keys", 6: "Colors", 7: "PlaylistTree", 8: "PlaylistEntries",
-        9: "Unknown09", 10: "Unknown0A", 11: "Unknown0B", 12: "Unknown0C",
-        13: "Artwork", 14: "Unknown0E", 15: "Unknown0F", 16: "Columns",
-        17: "HistoryPlaylists", 18: "HistoryEntries", 19: "History"
-    }
-
-    for p in header_pages:
-        page_offset = p * PAGE_SIZE
-        if page_offset >= len(data):
-            continue
-
-        page_type = read_u32(data, page_offset + 0x08)
-        table_name = table_names.get(page_type, f"Type{page_type}")
-
-        # Check if there's non-zero content after header
-        post_header = data[page_offset + HEADER_SIZE:page_offset + HEADER_SIZE + 32]
-        if any(b != 0 for b in post_header):
-            print(f"Page {p} ({table_name}): has content after header")
-            print(f"  Header+0x00: {hex_bytes(data, page_offset + HEADER_SIZE, 16)}")
-            print(f"  Header+0x10: {hex_bytes(data, page_offset + HEADER_SIZE + 16, 16)}")
-
-            # Try to interpret the structure
-            # It looks like: u32, u32, and then some pattern
-            v1 = read_u32(data, page_offset + HEADER_SIZE)
-            v2 = read_u32(data, page_offset + HEADER_SIZE + 4)
-            v3 = read_u32(data, page_offset + HEADER_SIZE + 8)
-            v4 = read_u32(data, page_offset + HEADER_SIZE + 12)
-            print(f"  Values: {v1:#x}, {v2:#x}, {v3:#x}, {v4:#x}")
-        else:
-            print(f"Page {p} ({table_name}): header page is empty after header")
+    with open_pdb(pdb_path, MADV_SEQUENTIAL) as data:
+        # Header pages (based on TABLE_LAYOUTS)
+        header_pages = [1, 3, 5, 7, 9, 11, 13, 15, 17, 19, 21, 23, 25, 27, 29, 31, 33, 35, 37, 39]
+
+        table_names = {
+            0: "Tracks", 1: "Genres", 2: "Artists", 3: "Albums", 4: "Labels",
+            5: "Keys", 6: "Colors", 7: "PlaylistTree", 8: "PlaylistEntries",
+            9: "Unknown09", 10: "Unknown0A", 11: "Unknown0B", 12: "Unknown0C",
+            13: "Artwork", 14: "Unknown0E", 15: "Unknown0F", 16: "Columns",
+            17: "HistoryPlaylists", 18: "HistoryEntries", 19: "History"
+        }
+
+        for p in header_pages:
+            page_offset = p * PAGE_SIZE
+            if page_offset >= len(data):
+                continue
+
+            # Header plus the 32 bytes after it, copied once
+            head = data[page_offset:page_offset + HEADER_SIZE + 32]
+            page_type = read_u32(head, 0x08)
+            table_name = table_names.get(page_type, f"Type{page_type}")
+
+            # Check if there's non-zero content after header
+            post_header = head[HEADER_SIZE:]
+            if post_header.count(0) != len(post_header):
+                print(f"Page {p} ({table_name}): has content after header", file=out)
+                print(f"  Header+0x00: {hex_bytes(head, HEADER_SIZE, 16)}", file=out)
+                print(f"  Header+0x10: {hex_bytes(head, HEADER_SIZE + 16, 16)}", file=out)
+
+                # Try to interpret the structure
+                # It looks like: u32, u32, and then some pattern
+                v1 = read_u32(head, HEADER_SIZE)
+                v2 = read_u32(head, HEADER_SIZE + 4)
+                v3 = read_u32(head, HEADER_SIZE + 8)
+                v4 = read_u32(head, HEADER_SIZE + 12)
+                print(f"  Values: {v1:#x}, {v2:#x}, {v3:#x}, {v4:#x}", file=out)
+            else:
+                print(f"Page {p} ({table_name}): header page is empty after header", file=out)
+
+def render_header_pages(pdb_path):
+    """Run analyze_header_pages into a string buffer"""
+    buf = io.StringIO()
+    analyze_header_pages(pdb_path, buf)
+    return buf.getvalue()
 
 if __name__ == "__main__":
-    import sys
+    ref = "/home/julien/Documents/Scripts/Pioneer/examples/PIONEER/rekordbox/export.pdb"
+    test = "/tmp/pioneer_test/PIONEER/rekordbox/export.pdb"
+
+    # Scan both files concurrently so their page-ins overlap
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        ref_report, test_report = pool.map(render_header_pages, (ref, test))
 
     print("=== Reference Export ===")
-    analyze_header_pages("/home/julien/Documents/Scripts/Pioneer/examples/PIONEER/rekordbox/export.pdb")
+    sys.stdout.write(ref_report)
 
     print("\n=== Our Export ===")
-    analyze_header_pages("/tmp/pioneer_test/PIONEER/rekordbox/export.pdb")
+    sys.stdout.write(test_report)
@@ -2,7 +2,17 @@
 """Analyze track row string offsets and data."""
 
 import sys
-import struct
+
+from _pdb_common import (
+    HEAP_START, PAGE_SIZE, STRING_KINDS, STRING_OFFSETS_COUNT, STRING_OFFSETS_POS,
+    TRACK_HEADER, TrackHeader, open_pdb_populated, read_u16_array,
+)
+
+# Placeholder returned when a long string fails to decode, by codec
+LONG_DECODE_ERRORS = {
+    'ascii': "(long ascii decode error)",
+    'utf-16-le': "(utf16 decode error)",
+}
 
 def decode_devicesql_string(data, offset):
     """Decode a DeviceSQL string at the given offset."""
@@ -10,37 +20,27 @@ def decode_devicesql_string(data, offset):
         return "(out of bounds)"
 
     header = data[offset]
+    _, codec, length = STRING_KINDS[header]
 
-    # Check if short ASCII (odd header byte)
-    if header & 1:
-        length = (header >> 1) - 1
+    # Short ASCII (odd header byte)
+    if length is not None:
         if length <= 0:
             return "(empty)"
         try:
             return data[offset + 1 : offset + 1 + length].decode('ascii', errors='replace')
         except:
             return f"(decode error, len={length})"
-    else:
-        # Long string format
-        if offset + 4 > len(data):
-            return "(long header out of bounds)"
-        flags = data[offset]
-        length_bytes = data[offset + 1 : offset + 4]
-        length = int.from_bytes(length_bytes, 'little') - 4
-        if flags == 0x40:
-            # Long ASCII
-            try:
-                return data[offset + 4 : offset + 4 + length].decode('ascii', errors='replace')
-            except:
-                return f"(long ascii decode error)"
-        elif flags == 0x90:
-            # Long UTF-16LE
-            try:
-                return data[offset + 4 : offset + 4 + length].decode('utf-16-le', errors='replace')
-            except:
-                return f"(utf16 decode error)"
-        else:
-            return f"(unknown flags: {flags:#x})"
+
+    # Long string format: 0x40 long ASCII, 0x90 long UTF-16LE
+    if offset + 4 > len(data):
+        return "(long header out of bounds)"
+    if codec is None:
+        return f"(unknown flags: {header:#x})"
+    length = int.from_bytes(data[offset + 1 : offset + 4], 'little') - 4
+    try:
+        return data[offset + 4 : offset + 4 + length].decode(codec, errors='replace')
+    except:
+        return LONG_DECODE_ERRORS[codec]
 
 STRING_NAMES = [
     "isrc", "lyricist", "unknown2", "unknown3", "unknown4",
@@ -54,45 +54,26 @@ def analyze_track_row(data, row_offset, label):
     """Analyze a single track row."""
     print(f"\n=== {label} Track Row ===")
 
-    row = data[row_offset:]
+    # A row and its strings never extend past one page heap
+    row = data[row_offset:row_offset + PAGE_SIZE - HEAP_START]
 
     # Header fields (first 94 bytes)
-    subtype = struct.unpack_from('<H', row, 0x00)[0]
-    index_shift = struct.unpack_from('<H', row, 0x02)[0]
-    bitmask = struct.unpack_from('<I', row, 0x04)[0]
-    sample_rate = struct.unpack_from('<I', row, 0x08)[0]
-    composer_id = struct.unpack_from('<I', row, 0x0c)[0]
-    file_size = struct.unpack_from('<I', row, 0x10)[0]
-    u2 = struct.unpack_from('<I', row, 0x14)[0]
-    artwork_id = struct.unpack_from('<I', row, 0x1c)[0]
-    key_id = struct.unpack_from('<I', row, 0x20)[0]
-    bitrate = struct.unpack_from('<I', row, 0x30)[0]
-    track_number = struct.unpack_from('<I', row, 0x34)[0]
-    tempo = struct.unpack_from('<I', row, 0x38)[0]
-    genre_id = struct.unpack_from('<I', row, 0x3c)[0]
-    album_id = struct.unpack_from('<I', row, 0x40)[0]
-    artist_id = struct.unpack_from('<I', row, 0x44)[0]
-    track_id = struct.unpack_from('<I', row, 0x48)[0]
-    duration = struct.unpack_from('<H', row, 0x54)[0]
-    file_type = struct.unpack_from('<H', row, 0x5a)[0]
-
-    print(f"  subtype: {subtype:#06x}")
-    print(f"  bitmask: {bitmask:#010x}")
-    print(f"  sample_rate: {sample_rate}")
-    print(f"  file_size: {file_size}")
-    print(f"  artwork_id: {artwork_id}")
-    print(f"  tempo: {tempo} (BPM: {tempo/100:.2f})")
-    print(f"  genre_id: {genre_id}, album_id: {album_id}, artist_id: {artist_id}")
-    print(f"  track_id: {track_id}")
-    print(f"  duration: {duration}s")
-    print(f"  file_type: {file_type}")
+    hdr = TrackHeader._make(TRACK_HEADER.unpack_from(row, 0))
+
+    print(f"  subtype: {hdr.subtype:#06x}")
+    print(f"  bitmask: {hdr.bitmask:#010x}")
+    print(f"  sample_rate: {hdr.sample_rate}")
+    print(f"  file_size: {hdr.file_size}")
+    print(f"  artwork_id: {hdr.artwork_id}")
+    print(f"  tempo: {hdr.tempo} (BPM: {hdr.tempo/100:.2f})")
+    print(f"  genre_id: {hdr.genre_id}, album_id: {hdr.album_id}, artist_id: {hdr.artist_id}")
+    print(f"  track_id: {hdr.id}")
+    print(f"  duration: {hdr.duration}s")
+    print(f"  file_type: {hdr.file_type}")
 
     # String offsets (21 x u16 at offset 0x5e)
     print(f"\n  String Offsets (21 @ 0x5e):")
-    string_offsets = []
-    for i in range(21):
-        offset = struct.unpack_from('<H', row, 0x5e + i * 2)[0]
-        string_offsets.append(offset)
+    string_offsets = read_u16_array(row, STRING_OFFSETS_POS, STRING_OFFSETS_COUNT)
 
     # Decode each string
     for i, offset in enumerate(string_offsets):
@@ -108,17 +89,12 @@ def main():
 
     ref_path, our_path = sys.argv[1], sys.argv[2]
 
-    with open(ref_path, 'rb') as f:
-        ref_data = f.read()
-
-    with open(our_path, 'rb') as f:
-        our_data = f.read()
-
     # Track page 2 starts at offset 0x2000, row data at 0x28
     track_row_offset = 0x2000 + 0x28
 
-    analyze_track_row(ref_data, track_row_offset, "Reference")
-    analyze_track_row(our_data, track_row_offset, "Our Export")
+    with open_pdb_populated(ref_path) as ref_data, open_pdb_populated(our_path) as our_data:
+        analyze_track_row(ref_data, track_row_offset, "Reference")
+        analyze_track_row(our_data, track_row_offset, "Our Export")
 
 if __name__ == "__main__":
     main()
@@ -4,28 +4,48 @@ ANLZ file comparison tool for debugging waveform issues.
 Parses and compares DAT and EXT files between two exports.
 """
 
+import io
 import sys
 import struct
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Optional, Tuple, Dict
 
-@dataclass
+# Precompiled big-endian unpackers
+_u32 = struct.Struct('>I').unpack_from
+_u32_pair = struct.Struct('>II').unpack_from
+_u32_triple = struct.Struct('>III').unpack_from
+# Common section header: tag, header_len, total_len
+_section_header = struct.Struct('>4sII').unpack_from
+# Section-specific fields following the common header
+_pwv_detail_header = struct.Struct('>12xIIH').unpack_from  # PWV3/PWV5: unknown1, entry_count, unknown2
+_pcob_header = struct.Struct('>16xII').unpack_from  # PCOB: entry_count, memory_count
+
+# Directory comparisons with fewer file pairs than this run in-process;
+# a single track's ANLZ directory holds only a few files
+PARALLEL_MIN_PAIRS = 8
+
+@dataclass(slots=True)
 class Section:
     """Represents an ANLZ section"""
     tag: str
     header_len: int
     total_len: int
     offset: int
-    data: bytes
+    data: memoryview
+    payload: memoryview = field(init=False, repr=False)
 
-    @property
-    def payload(self) -> bytes:
-        return self.data[self.header_len:]
+    def __post_init__(self):
+        self.payload = self.data[self.header_len:]
 
 def parse_anlz_file(path: Path) -> List[Section]:
     """Parse an ANLZ file (DAT or EXT) into sections"""
-    data = path.read_bytes()
+    return parse_anlz_data(memoryview(path.read_bytes()))
+
+def parse_anlz_data(data: memoryview) -> List[Section]:
+    """Parse ANLZ file contents into sections"""
+    # Sections are zero-copy views into the file contents
     sections = []
     offset = 0
 
@@ -33,14 +53,12 @@ def parse_anlz_file(path: Path) -> List[Section]:
     if len(data) < 28:
         return sections
 
-    tag = data[0:4].decode('ascii', errors='replace')
+    tag_b, pmai_header_len, pmai_total_len = _section_header(data, 0)
+    tag = tag_b.decode('ascii', errors='replace')
     if tag != 'PMAI':
         print(f"Warning: Expected PMAI header, got {tag}")
         return sections
 
-    pmai_header_len = struct.unpack('>I', data[4:8])[0]
-    pmai_total_len = struct.unpack('>I', data[8:12])[0]
-
     # Add PMAI as first section (but it's really a file header)
     sections.append(Section('PMAI', pmai_header_len, pmai_total_len, 0, data[0:pmai_header_len]))
 
@@ -51,9 +69,8 @@ def parse_anlz_file(path: Path) -> List[Section]:
         if offset + 12 > len(data):
             break
 
-        tag = data[offset:offset+4].decode('ascii', errors='replace')
-        header_len = struct.unpack('>I', data[offset+4:offset+8])[0]
-        total_len = struct.unpack('>I', data[offset+8:offset+12])[0]
+        tag_b, header_len, total_len = _section_header(data, offset)
+        tag = tag_b.decode('ascii', errors='replace')
 
         if total_len == 0 or offset + total_len > len(data):
             break
@@ -64,7 +81,14 @@ def parse_anlz_file(path: Path) -> List[Section]:
 
     return sections
 
-def format_bytes(data: bytes, max_bytes: int = 64) -> str:
+def index_sections(sections: List[Section]) -> Dict[str, List[Section]]:
+    """Group sections by tag, keeping file order within each tag"""
+    by_tag: Dict[str, List[Section]] = {}
+    for sec in sections:
+        by_tag.setdefault(sec.tag, []).append(sec)
+    return by_tag
+
+def format_bytes(data: memoryview, max_bytes: int = 64) -> str:
     """Format bytes as hex string"""
     if len(data) <= max_bytes:
         return data.hex()
@@ -73,23 +97,24 @@ def format_bytes(data: bytes, max_bytes: int = 64) -> str:
 def parse_pmai(section: Section) -> dict:
     """Parse PMAI file header"""
     data = section.data
+    unknown1, unknown2, unknown3 = _u32_triple(data, 12)
     return {
         'header_len': section.header_len,
         'total_len': section.total_len,
-        'unknown1': struct.unpack('>I', data[12:16])[0],
-        'unknown2': struct.unpack('>I', data[16:20])[0],
-        'unknown3': struct.unpack('>I', data[20:24])[0],
-        'unknown4': struct.unpack('>I', data[24:28])[0] if len(data) >= 28 else None,
+        'unknown1': unknown1,
+        'unknown2': unknown2,
+        'unknown3': unknown3,
+        'unknown4': _u32(data, 24)[0] if len(data) >= 28 else None,
     }
 
 def parse_ppth(section: Section) -> dict:
     """Parse PPTH path section"""
     data = section.data
-    path_len = struct.unpack('>I', data[12:16])[0]
+    path_len = _u32(data, 12)[0]
     path_bytes = data[16:16+path_len]
     # UTF-16BE path
     try:
-        path = path_bytes.decode('utf-16-be').rstrip('\x00')
+        path = str(path_bytes, 'utf-16-be').rstrip('\x00')
     except:
         path = path_bytes.hex()
     return {
@@ -111,7 +136,7 @@ def parse_pvbr(section: Section) -> dict:
 def parse_pwav(section: Section) -> dict:
     """Parse PWAV waveform preview (400 bytes)"""
     data = section.data
-    entry_count = struct.unpack('>I', data[12:16])[0]
+    entry_count = _u32(data, 12)[0]
     return {
         'header_len': section.header_len,
         'total_len': section.total_len,
@@ -124,7 +149,7 @@ def parse_pwav(section: Section) -> dict:
 def parse_pwv2(section: Section) -> dict:
     """Parse PWV2 tiny preview (100 bytes)"""
     data = section.data
-    entry_count = struct.unpack('>I', data[12:16])[0]
+    entry_count = _u32(data, 12)[0]
     return {
         'header_len': section.header_len,
         'total_len': section.total_len,
@@ -137,9 +162,7 @@ def parse_pwv3(section: Section) -> dict:
     """Parse PWV3 monochrome waveform detail"""
     data = section.data
     # Header: tag(4) + header_len(4) + total_len(4) + unknown(4) + entry_count(4) + unknown2(4)
-    entry_count = struct.unpack('>I', data[16:20])[0]
-    unknown1 = struct.unpack('>I', data[12:16])[0]
-    unknown2 = struct.unpack('>H', data[20:22])[0]
+    unknown1, entry_count, unknown2 = _pwv_detail_header(data, 0)
     return {
         'header_len': section.header_len,
         'total_len': section.total_len,
@@ -155,9 +178,7 @@ def parse_pwv5(section: Section) -> dict:
     """Parse PWV5 color waveform detail (2 bytes per entry)"""
     data = section.data
     # Header: tag(4) + header_len(4) + total_len(4) + unknown(4) + entry_count(4) + unknown2(4)
-    entry_count = struct.unpack('>I', data[16:20])[0]
-    unknown1 = struct.unpack('>I', data[12:16])[0]
-    unknown2 = struct.unpack('>H', data[20:22])[0]
+    unknown1, entry_count, unknown2 = _pwv_detail_header(data, 0)
     payload = section.payload
     return {
         'header_len': section.header_len,
@@ -173,22 +194,22 @@ def parse_pwv5(section: Section) -> dict:
 def parse_pwv4(section: Section) -> dict:
     """Parse PWV4 color preview (1200 x 6 bytes)"""
     data = section.data
-    entry_count = struct.unpack('>I', data[16:20])[0]
-    unknown1 = struct.unpack('>I', data[12:16])[0]
+    unknown1, entry_count = _u32_pair(data, 12)
+    payload = bytes(section.payload)
     return {
         'header_len': section.header_len,
         'total_len': section.total_len,
         'unknown1': hex(unknown1),
         'entry_count': entry_count,
-        'payload_size': len(section.payload),
-        'non_zero_bytes': sum(1 for b in section.payload if b != 0),
+        'payload_size': len(payload),
+        'non_zero_bytes': len(payload) - payload.count(0),
     }
 
 def parse_pqtz(section: Section) -> dict:
     """Parse PQTZ beat grid"""
     data = section.data
     # Header: tag(4) + header_len(4) + total_len(4) + unknown(4) + unknown(4) + entry_count(4)
-    entry_count = struct.unpack('>I', data[20:24])[0] if len(data) >= 24 else 0
+    entry_count = _u32(data, 20)[0] if len(data) >= 24 else 0
     return {
         'header_len': section.header_len,
         'total_len': section.total_len,
@@ -199,8 +220,11 @@ def parse_pqtz(section: Section) -> dict:
 def parse_pcob(section: Section) -> dict:
     """Parse PCOB cue/loop section"""
     data = section.data
-    entry_count = struct.unpack('>I', data[16:20])[0] if len(data) >= 20 else 0
-    memory_count = struct.unpack('>I', data[20:24])[0] if len(data) >= 24 else 0
+    if len(data) >= 24:
+        entry_count, memory_count = _pcob_header(data, 0)
+    else:
+        entry_count = _u32(data, 16)[0] if len(data) >= 20 else 0
+        memory_count = 0
     return {
         'header_len': section.header_len,
         'total_len': section.total_len,
@@ -211,7 +235,7 @@ def parse_pcob(section: Section) -> dict:
 def parse_pco2(section: Section) -> dict:
     """Parse PCO2 extended cue section"""
     data = section.data
-    entry_count = struct.unpack('>I', data[16:20])[0] if len(data) >= 20 else 0
+    entry_count = _u32(data, 16)[0] if len(data) >= 20 else 0
     return {
         'header_len': section.header_len,
         'total_len': section.total_len,
@@ -254,6 +278,21 @@ def analyze_file(path: Path) -> None:
         else:
             print(f"  raw data: {format_bytes(section.data, 32)}")
 
+def count_byte_diffs(a: memoryview, b: memoryview) -> Tuple[int, Optional[int]]:
+    """Count differing bytes between equal-length buffers and find the first one
+
+    XORs the buffers as big integers so both the count and the position
+    are computed in C rather than per byte in Python.
+    """
+    n = len(a)
+    x = int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')
+    if not x:
+        return 0, None
+    diff_count = n - x.to_bytes(n, 'big').count(0)
+    # The most significant non-zero byte is the lowest differing offset
+    first = n - 1 - (x.bit_length() - 1) // 8
+    return diff_count, first
+
 def compare_sections(sec1: Section, sec2: Section, name1: str, name2: str) -> List[str]:
     """Compare two sections and return differences"""
     diffs = []
@@ -267,61 +306,70 @@ def compare_sections(sec1: Section, sec2: Section, name1: str, name2: str) -> Li
     p1, p2 = sec1.payload, sec2.payload
     if len(p1) != len(p2):
         diffs.append(f"  payload size: {len(p1)} vs {len(p2)}")
+    elif p1 == p2:
+        return diffs
 
     min_len = min(len(p1), len(p2))
-    diff_count = sum(1 for i in range(min_len) if p1[i] != p2[i])
+    diff_count, first = count_byte_diffs(p1[:min_len], p2[:min_len])
     if diff_count > 0:
         diffs.append(f"  differing bytes: {diff_count}/{min_len}")
-        # Find first difference
-        for i in range(min_len):
-            if p1[i] != p2[i]:
-                diffs.append(f"  first diff at offset {i}: {hex(p1[i])} vs {hex(p2[i])}")
-                break
+        diffs.append(f"  first diff at offset {first}: {hex(p1[first])} vs {hex(p2[first])}")
 
     return diffs
 
-def compare_files(path1: Path, path2: Path) -> None:
+def compare_files(path1: Path, path2: Path, out=sys.stdout) -> None:
     """Compare two ANLZ files"""
-    print(f"\n{'='*60}")
-    print(f"Comparing:")
-    print(f"  A: {path1}")
-    print(f"  B: {path2}")
-    print(f"{'='*60}")
+    print(f"\n{'='*60}", file=out)
+    print(f"Comparing:", file=out)
+    print(f"  A: {path1}", file=out)
+    print(f"  B: {path2}", file=out)
+    print(f"{'='*60}", file=out)
 
-    sections1 = parse_anlz_file(path1)
-    sections2 = parse_anlz_file(path2)
+    data1 = memoryview(path1.read_bytes())
+    data2 = memoryview(path2.read_bytes())
+    if data1 == data2:
+        print(f"\nFiles are byte-identical ({len(data1)} bytes)", file=out)
+        return
+
+    sections1 = parse_anlz_data(data1)
+    sections2 = parse_anlz_data(data2)
 
     tags1 = [s.tag for s in sections1]
     tags2 = [s.tag for s in sections2]
 
-    print(f"\nSection order A: {' -> '.join(tags1)}")
-    print(f"Section order B: {' -> '.join(tags2)}")
+    print(f"\nSection order A: {' -> '.join(tags1)}", file=out)
+    print(f"Section order B: {' -> '.join(tags2)}", file=out)
 
     if tags1 != tags2:
-        print("\n*** SECTION ORDER DIFFERS! ***")
-
-    # Compare each section
-    sections2_by_tag = {s.tag: s for s in sections2}
-
-    for sec1 in sections1:
-        sec2 = sections2_by_tag.get(sec1.tag)
-        if not sec2:
-            print(f"\n[{sec1.tag}] - MISSING in B")
-            continue
-
-        diffs = compare_sections(sec1, sec2, "A", "B")
-        if diffs:
-            print(f"\n[{sec1.tag}] - DIFFERS:")
-            for d in diffs:
-                print(d)
-        else:
-            print(f"\n[{sec1.tag}] - IDENTICAL")
+        print("\n*** SECTION ORDER DIFFERS! ***", file=out)
+
+    # Compare each section, pairing repeated tags by position
+    by_tag1 = index_sections(sections1)
+    by_tag2 = index_sections(sections2)
+
+    for tag, secs1 in by_tag1.items():
+        secs2 = by_tag2.get(tag, [])
+        for sec1, sec2 in zip(secs1, secs2):
+            diffs = compare_sections(sec1, sec2, "A", "B")
+            if diffs:
+                print(f"\n[{tag}] - DIFFERS:", file=out)
+                for d in diffs:
+                    print(d, file=out)
+            else:
+                print(f"\n[{tag}] - IDENTICAL", file=out)
+        for _ in secs1[len(secs2):]:
+            print(f"\n[{tag}] - MISSING in B", file=out)
 
     # Check for sections only in B
-    tags1_set = set(tags1)
-    for sec2 in sections2:
-        if sec2.tag not in tags1_set:
-            print(f"\n[{sec2.tag}] - ONLY in B")
+    for tag, secs2 in by_tag2.items():
+        for _ in secs2[len(by_tag1.get(tag, ())):]:
+            print(f"\n[{tag}] - ONLY in B", file=out)
+
+def render_comparison(paths: Tuple[Path, Path]) -> str:
+    """Compare two ANLZ files and return the report as a string"""
+    out = io.StringIO()
+    compare_files(*paths, out=out)
+    return out.getvalue()
 
 def main():
     if len(sys.argv) < 2:
@@ -354,13 +402,30 @@ def main():
             files1 = {f.name: f for f in path1.glob('ANLZ*.*')}
             files2 = {f.name: f for f in path2.glob('ANLZ*.*')}
 
-            for name in sorted(set(files1.keys()) | set(files2.keys())):
-                if name in files1 and name in files2:
-                    compare_files(files1[name], files2[name])
-                elif name in files1:
-                    print(f"\n{name}: ONLY in A")
-                else:
-                    print(f"\n{name}: ONLY in B")
+            names = sorted(set(files1.keys()) | set(files2.keys()))
+            pairs = [(files1[name], files2[name]) for name in names
+                     if name in files1 and name in files2]
+
+            # Each pair is independent; spread large directories across
+            # processes, map() keeps the reports in name order
+            if len(pairs) >= PARALLEL_MIN_PAIRS:
+                executor = ProcessPoolExecutor()
+                reports = executor.map(render_comparison, pairs, chunksize=8)
+            else:
+                executor = None
+                reports = map(render_comparison, pairs)
+
+            try:
+                for name in names:
+                    if name in files1 and name in files2:
+                        sys.stdout.write(next(reports))
+                    elif name in files1:
+                        print(f"\n{name}: ONLY in A")
+                    else:
+                        print(f"\n{name}: ONLY in B")
+            finally:
+                if executor is not None:
+                    executor.shutdown()
         else:
             print("Error: Both arguments must be files or both must be directories")
             sys.exit(1)
@@ -4,18 +4,15 @@ Check num_rows_small vs num_rows_large across all data pages in reference.
 """
 
 import struct
-from pathlib import Path
 
-PAGE_SIZE = 4096
-
-def read_u8(data, offset):
-    return data[offset]
+from _pdb_common import MADV_SEQUENTIAL, open_pdb
 
-def read_u16(data, offset):
-    return struct.unpack_from('<H', data, offset)[0]
+PAGE_SIZE = 4096
 
-def read_u32(data, offset):
-    return struct.unpack_from('<I', data, offset)[0]
+# Page header fields: type @0x08, num_rows_small @0x18, page_flags @0x1b,
+# free_size @0x1c, used_size @0x1e, num_rows_large @0x22.
+# One whole page per record, so iter_unpack walks every page header in C
+PAGE_RECORD = struct.Struct(f'<8xI12xB2xBHH2xH{PAGE_SIZE - 0x24}x')
 
 TABLE_NAMES = {
     0: "Tracks", 1: "Genres", 2: "Artists", 3: "Albums", 4: "Labels",
@@ -24,21 +21,16 @@ TABLE_NAMES = {
 }
 
 def analyze_rows(pdb_path):
-    data = Path(pdb_path).read_bytes()
+    data = open_pdb(pdb_path, MADV_SEQUENTIAL)
     num_pages = len(data) // PAGE_SIZE
 
     print(f"Analyzing {pdb_path}")
     print(f"Page  Type              rows_s  rows_l  used    free")
     print("-" * 60)
 
-    for page_idx in range(num_pages):
-        page_offset = page_idx * PAGE_SIZE
-        table_type = read_u32(data, page_offset + 0x08)
-        num_rows_small = read_u8(data, page_offset + 0x18)
-        page_flags = read_u8(data, page_offset + 0x1b)
-        free_size = read_u16(data, page_offset + 0x1c)
-        used_size = read_u16(data, page_offset + 0x1e)
-        num_rows_large = read_u16(data, page_offset + 0x22)
+    pages = PAGE_RECORD.iter_unpack(memoryview(data)[:num_pages * PAGE_SIZE])
+    for page_idx, (table_type, num_rows_small, page_flags, free_size, used_size,
+                   num_rows_large) in enumerate(pages):
 
         # Skip header pages (page_flags & 0x40) and empty pages
         if page_flags & 0x40:
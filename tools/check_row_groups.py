@@ -4,19 +4,14 @@ Check row group flags vs num_rows_large to find the pattern.
 """
 
 import struct
-from pathlib import Path
+
+from _pdb_common import open_pdb, read_u16
 
 PAGE_SIZE = 4096
 HEAP_START = 0x28
 
-def read_u8(data, offset):
-    return data[offset]
-
-def read_u16(data, offset):
-    return struct.unpack_from('<H', data, offset)[0]
-
-def read_u32(data, offset):
-    return struct.unpack_from('<I', data, offset)[0]
+# Row group: 16 u16 offsets (skipped), then flags and unknown u16s
+GROUP_FLAGS = struct.Struct('<32xHH')
 
 def get_row_group_info(data, page_offset, num_rows):
     """Get row group flags and count present rows"""
@@ -26,22 +21,15 @@ def get_row_group_info(data, page_offset, num_rows):
     num_groups = (num_rows + 15) // 16
     group_area_start = page_offset + PAGE_SIZE - (num_groups * 36)
 
-    total_present = 0
-    group_info = []
-
-    for g in range(num_groups):
-        group_offset = group_area_start + (g * 36)
-        flags = read_u16(data, group_offset + 32)
-        unknown = read_u16(data, group_offset + 34)
-        present = bin(flags).count('1')
-        total_present += present
-        group_info.append((flags, unknown, present))
+    # Each 36-byte group ends with its flags and unknown u16s
+    group_area = memoryview(data)[group_area_start:page_offset + PAGE_SIZE]
+    group_info = [(flags, unknown, flags.bit_count())
+                  for flags, unknown in GROUP_FLAGS.iter_unpack(group_area)]
+    total_present = sum(present for _, _, present in group_info)
 
     return num_groups, total_present, group_info
 
 def analyze(pdb_path):
-    data = Path(pdb_path).read_bytes()
-
     # Data pages to check
     pages = [
         (2, "Tracks"),
@@ -60,6 +48,7 @@ def analyze(pdb_path):
         (40, "History"),
         (51, "Tracks2"),
     ]
+    data = open_pdb(pdb_path, hint_pages=[page_idx for page_idx, _ in pages])
 
     print(f"Analyzing {pdb_path}")
     print(f"Page  Table             rows_s  rows_l  groups  present  flags")
@@ -70,7 +59,7 @@ def analyze(pdb_path):
         if page_offset >= len(data):
             continue
 
-        num_rows_small = read_u8(data, page_offset + 0x18)
+        num_rows_small = data[page_offset + 0x18]
         num_rows_large = read_u16(data, page_offset + 0x22)
 
         if num_rows_small == 0:
@@ -3,46 +3,23 @@
 Check how reference PDB pads strings/rows.
 """
 
-import struct
-from pathlib import Path
+from _pdb_common import get_row_offsets, hex_bytes, open_pdb, read_u32
 
 PAGE_SIZE = 4096
 HEAP_START = 0x28
 
-def read_u8(data, offset):
-    return data[offset]
-
-def read_u16(data, offset):
-    return struct.unpack_from('<H', data, offset)[0]
-
-def read_u32(data, offset):
-    return struct.unpack_from('<I', data, offset)[0]
-
-def hex_bytes(data, start, length):
-    return ' '.join(f'{data[start + i]:02x}' for i in range(min(length, len(data) - start)))
-
 def check_genres_padding(pdb_path):
     """Check Genre row padding"""
-    data = Path(pdb_path).read_bytes()
+    data = open_pdb(pdb_path, hint_pages=(4,))
 
     page_offset = 4 * PAGE_SIZE
     num_rows = data[page_offset + 0x18]
 
     # Get row offsets
-    num_groups = (num_rows + 15) // 16
-    group_area_start = page_offset + PAGE_SIZE - (num_groups * 36)
-
-    offsets = []
-    for g in range(num_groups):
-        group_offset = group_area_start + (g * 36)
-        flags = read_u16(data, group_offset + 32)
-        for i in range(16):
-            if flags & (1 << i):
-                off = read_u16(data, group_offset + (15 - i) * 2)
-                offsets.append(off)
+    offsets = get_row_offsets(data, page_offset, num_rows)
 
     print(f"=== Genre Rows ({num_rows} rows) ===")
-    for i, off in enumerate(offsets[:num_rows]):
+    for i, off in enumerate(offsets):
         row_start = page_offset + HEAP_START + off
         # Genre row: u32 id, then string
         genre_id = read_u32(data, row_start)
@@ -79,25 +56,15 @@ def check_genres_padding(pdb_path):
 
 def check_colors_padding(pdb_path):
     """Check Color row padding"""
-    data = Path(pdb_path).read_bytes()
+    data = open_pdb(pdb_path, hint_pages=(14,))
 
     page_offset = 14 * PAGE_SIZE
     num_rows = data[page_offset + 0x18]
 
-    num_groups = (num_rows + 15) // 16
-    group_area_start = page_offset + PAGE_SIZE - (num_groups * 36)
-
-    offsets = []
-    for g in range(num_groups):
-        group_offset = group_area_start + (g * 36)
-        flags = read_u16(data, group_offset + 32)
-        for i in range(16):
-            if flags & (1 << i):
-                off = read_u16(data, group_offset + (15 - i) * 2)
-                offsets.append(off)
+    offsets = get_row_offsets(data, page_offset, num_rows)
 
     print(f"\n=== Color Rows ({num_rows} rows) ===")
-    for i, off in enumerate(offsets[:num_rows]):
+    for i, off in enumerate(offsets):
         row_start = page_offset + HEAP_START + off
         # Color row: u32+u8+u8+u16 = 8 bytes, then string
         string_start = row_start + 8
@@ -4,6 +4,11 @@
 import sys
 import struct
 
+# page_size @0x04, num_tables @0x08, next_unused_page @0x0c, sequence @0x14
+FILE_HEADER = struct.Struct('<4xIII4xI')
+# Table entry: empty_candidate, first_page, last_page, type
+TABLE_ENTRY = struct.Struct('<IIII')
+
 def parse_header(data):
     """Parse the PDB header and return table info."""
     # Header structure
@@ -16,30 +21,21 @@ def parse_header(data):
     # 0x18-0x1b: gap (always 0)
     # 0x1c+: table entries (16 bytes each)
 
-    page_size = struct.unpack_from('<I', data, 0x04)[0]
-    num_tables = struct.unpack_from('<I', data, 0x08)[0]
-    next_unused = struct.unpack_from('<I', data, 0x0c)[0]
-    sequence = struct.unpack_from('<I', data, 0x14)[0]
+    page_size, num_tables, next_unused, sequence = FILE_HEADER.unpack_from(data, 0)
 
     print(f"  Page size: {page_size}")
     print(f"  Num tables: {num_tables}")
     print(f"  Next unused page: {next_unused}")
     print(f"  Sequence: {sequence}")
 
-    tables = []
-    offset = 0x1c
-    for i in range(num_tables):
-        empty_candidate = struct.unpack_from('<I', data, offset)[0]
-        first_page = struct.unpack_from('<I', data, offset + 4)[0]
-        last_page = struct.unpack_from('<I', data, offset + 8)[0]
-        table_type = struct.unpack_from('<I', data, offset + 12)[0]
-        tables.append({
-            'type': table_type,
-            'first': first_page,
-            'last': last_page,
-            'empty_candidate': empty_candidate
-        })
-        offset += 16
+    table_area = memoryview(data)[0x1c:0x1c + num_tables * TABLE_ENTRY.size]
+    tables = [{
+        'type': table_type,
+        'first': first_page,
+        'last': last_page,
+        'empty_candidate': empty_candidate
+    } for empty_candidate, first_page, last_page, table_type
+        in TABLE_ENTRY.iter_unpack(table_area)]
 
     return tables
 
@@ -3,13 +3,19 @@
 Deep comparison of track rows between two PDB files.
 """
 
-import struct
 import sys
+from collections import namedtuple
 from pathlib import Path
 
+from _pdb_common import FULL_PAGE_HEADER, FULL_PAGE_HEADER_FIELDS, ROW_GROUP, TRACK_HEADER, set_bits
+
 PAGE_SIZE = 4096
 HEAP_START = 0x28
 
+# Page header report labels; this tool calls the type field table_type
+PAGE_HEADER_LABELS = tuple('table_type' if name == 'type' else name
+                           for name in FULL_PAGE_HEADER_FIELDS)
+
 TRACK_FIELDS = [
     (0x00, 2, 'subtype'),
     (0x02, 2, 'index_shift'),
@@ -43,122 +49,85 @@ TRACK_FIELDS = [
     (0x5A, 2, 'file_type'),
     (0x5C, 2, 'u7'),
 ]
+# Same layout as _pdb_common.TRACK_HEADER, under this tool's field names
+TRACK_FIELD_NAMES = [name for _, _, name in TRACK_FIELDS]
+TrackRow = namedtuple('TrackRow', TRACK_FIELD_NAMES)
 
 def read_file(path):
+    # Pages and rows are sliced from this view without copying
     with open(path, "rb") as f:
-        return f.read()
+        return memoryview(f.read())
 
 def get_page(data, page_num):
     start = page_num * PAGE_SIZE
     return data[start:start + PAGE_SIZE]
 
 def parse_row_groups(page_data):
-    group = page_data[-36:]
-    offsets = []
-    for i in range(16):
-        off = struct.unpack_from('<H', group, (15-i)*2)[0]
-        offsets.append(off)
-    flags = struct.unpack_from('<H', group, 32)[0]
-    unknown = struct.unpack_from('<H', group, 34)[0]
-    return offsets, flags, unknown
+    # Offsets are stored last row first, followed by flags and unknown
+    words = ROW_GROUP.unpack_from(page_data, len(page_data) - ROW_GROUP.size)
+    return list(words[15::-1]), words[16], words[17]
 
 def parse_track_row(page_data, heap_offset):
-    row_start = HEAP_START + heap_offset
-    row = page_data[row_start:]
-    result = {}
-    for offset, size, name in TRACK_FIELDS:
-        if size == 1:
-            result[name] = row[offset]
-        elif size == 2:
-            result[name] = struct.unpack_from('<H', row, offset)[0]
-        elif size == 4:
-            result[name] = struct.unpack_from('<I', row, offset)[0]
-    result['string_offsets'] = []
-    for i in range(21):
-        off = struct.unpack_from('<H', row, 0x5E + i*2)[0]
-        result['string_offsets'].append(off)
-    return result, row[:0x88]
+    """Decode the fixed track row header (string offsets follow at 0x5e)"""
+    return TrackRow._make(TRACK_HEADER.unpack_from(page_data, HEAP_START + heap_offset))
+
+def load_tracks(page_data):
+    """Parse the page's first row group and its present track rows
+
+    Returns (offsets, flags, unknown, rows) with TrackRow tuples keyed by slot.
+    """
+    offsets, flags, unknown = parse_row_groups(page_data)
+    rows = {slot: parse_track_row(page_data, offsets[slot]) for slot in set_bits(flags)}
+    return offsets, flags, unknown, rows
 
 def compare_pages(page1, page2, label1="REF", label2="GEN"):
-    print(f"\n{'='*70}")
-    print(f"PAGE HEADER COMPARISON")
-    print(f"{'='*70}")
-
-    header_fields = [
-        (0x00, 4, 'padding'),
-        (0x04, 4, 'page_index'),
-        (0x08, 4, 'table_type'),
-        (0x0C, 4, 'next_page'),
-        (0x10, 4, 'unknown1'),
-        (0x14, 4, 'unknown2'),
-        (0x18, 1, 'num_rows_small'),
-        (0x19, 1, 'unknown3'),
-        (0x1A, 1, 'unknown4'),
-        (0x1B, 1, 'page_flags'),
-        (0x1C, 2, 'free_size'),
-        (0x1E, 2, 'used_size'),
-        (0x20, 2, 'unknown5'),
-        (0x22, 2, 'num_rows_large'),
-        (0x24, 2, 'unknown6'),
-        (0x26, 2, 'unknown7'),
-    ]
-
-    for offset, size, name in header_fields:
-        if size == 1:
-            v1 = page1[offset]
-            v2 = page2[offset]
-        elif size == 2:
-            v1 = struct.unpack_from('<H', page1, offset)[0]
-            v2 = struct.unpack_from('<H', page2, offset)[0]
-        elif size == 4:
-            v1 = struct.unpack_from('<I', page1, offset)[0]
-            v2 = struct.unpack_from('<I', page2, offset)[0]
+    # Report lines are collected and written out in one go
+    lines = []
+    lines.append(f"\n{'='*70}")
+    lines.append(f"PAGE HEADER COMPARISON")
+    lines.append(f"{'='*70}")
+
+    hdr1 = FULL_PAGE_HEADER.unpack_from(page1, 0)
+    hdr2 = FULL_PAGE_HEADER.unpack_from(page2, 0)
+    for name, v1, v2 in zip(PAGE_HEADER_LABELS, hdr1, hdr2):
         match = "==" if v1 == v2 else "!="
-        print(f"  {name:18s}: {label1}=0x{v1:08x}  {match}  {label2}=0x{v2:08x}")
-
-    print(f"\n{'='*70}")
-    print(f"ROW GROUPS")
-    print(f"{'='*70}")
-
-    off1, flags1, unk1 = parse_row_groups(page1)
-    off2, flags2, unk2 = parse_row_groups(page2)
-
-    print(f"  {label1}: flags=0x{flags1:04x}, unknown=0x{unk1:04x}, offsets={[o for o in off1 if o != 0]}")
-    print(f"  {label2}: flags=0x{flags2:04x}, unknown=0x{unk2:04x}, offsets={[o for o in off2 if o != 0]}")
-
-    print(f"\n{'='*70}")
-    print(f"TRACK ROWS")
-    print(f"{'='*70}")
-
-    for slot in range(16):
-        has1 = (flags1 & (1 << slot)) != 0
-        has2 = (flags2 & (1 << slot)) != 0
-        if not has1 and not has2:
-            continue
-        print(f"\n  --- Slot {slot} ---")
-        if has1:
-            row1, raw1 = parse_track_row(page1, off1[slot])
-            print(f"  {label1}: offset={off1[slot]}")
-        else:
-            row1 = None
-            print(f"  {label1}: <empty>")
-        if has2:
-            row2, raw2 = parse_track_row(page2, off2[slot])
-            print(f"  {label2}: offset={off2[slot]}")
+        lines.append(f"  {name:18s}: {label1}=0x{v1:08x}  {match}  {label2}=0x{v2:08x}")
+
+    lines.append(f"\n{'='*70}")
+    lines.append(f"ROW GROUPS")
+    lines.append(f"{'='*70}")
+
+    off1, flags1, unk1, rows1 = load_tracks(page1)
+    off2, flags2, unk2, rows2 = load_tracks(page2)
+
+    lines.append(f"  {label1}: flags=0x{flags1:04x}, unknown=0x{unk1:04x}, offsets={[o for o in off1 if o != 0]}")
+    lines.append(f"  {label2}: flags=0x{flags2:04x}, unknown=0x{unk2:04x}, offsets={[o for o in off2 if o != 0]}")
+
+    lines.append(f"\n{'='*70}")
+    lines.append(f"TRACK ROWS")
+    lines.append(f"{'='*70}")
+
+    for slot in set_bits(flags1 | flags2):
+        row1 = rows1.get(slot)
+        row2 = rows2.get(slot)
+        lines.append(f"\n  --- Slot {slot} ---")
+        for label, row, offsets in ((label1, row1, off1), (label2, row2, off2)):
+            if row is None:
+                lines.append(f"  {label}: <empty>")
+            else:
+                lines.append(f"  {label}: offset={offsets[slot]}")
+
+        if row1 is not None and row2 is not None:
+            # Whole-row tuple compare first; identical rows are the common case
+            if row1 != row2:
+                lines.extend(f"    {name:18s}: 0x{v1:08x} != 0x{v2:08x}"
+                             for name, v1, v2 in zip(TRACK_FIELD_NAMES, row1, row2)
+                             if v1 != v2)
         else:
-            row2 = None
-            print(f"  {label2}: <empty>")
-
-        if has1 and has2:
-            for offset, size, name in TRACK_FIELDS:
-                v1 = row1[name]
-                v2 = row2[name]
-                if v1 != v2:
-                    print(f"    {name:18s}: 0x{v1:08x} != 0x{v2:08x}")
-        elif has1:
-            print(f"    Track data: subtype=0x{row1['subtype']:04x}, track_id={row1['track_id']}")
-        elif has2:
-            print(f"    Track data: subtype=0x{row2['subtype']:04x}, track_id={row2['track_id']}")
+            row = row1 if row1 is not None else row2
+            lines.append(f"    Track data: subtype=0x{row.subtype:04x}, track_id={row.track_id}")
+
+    sys.stdout.write('\n'.join(lines) + '\n')
 
 if len(sys.argv) < 3:
     print("Usage: compare_tracks.py <ref.pdb> <gen.pdb>")
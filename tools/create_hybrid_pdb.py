@@ -4,8 +4,10 @@ Create a hybrid PDB that uses our header structure with reference data pages.
 This helps isolate whether the issue is in headers vs data content.
 """
 
+import os
 import shutil
-from pathlib import Path
+
+from _pdb_common import open_pdb
 
 PAGE_SIZE = 4096
 
@@ -17,52 +19,55 @@ def create_hybrid(ref_path, test_path, output_path):
     - Use reference file's data pages (2, 4, 6, 8, 10, 12, 14, 16, 18, 28, 34, 36, 38, 40, 51)
     - Use test file's empty candidate pages
     """
-    ref_data = bytearray(Path(ref_path).read_bytes())
-    test_data = bytearray(Path(test_path).read_bytes())
+    data_pages = [2, 4, 6, 8, 10, 12, 14, 16, 18, 28, 34, 36, 38, 40, 51]
 
-    # Start with a copy of test (to get correct file size and empty pages)
-    output_data = bytearray(test_data)
+    # Start with a copy of test (to get correct file size and empty pages);
+    # copyfile lets the kernel copy it, only swapped pages pass through here
+    shutil.copyfile(test_path, output_path)
 
-    # Copy data pages from reference
-    data_pages = [2, 4, 6, 8, 10, 12, 14, 16, 18, 28, 34, 36, 38, 40, 51]
+    with open_pdb(ref_path, hint_pages=data_pages) as ref_data, \
+         memoryview(ref_data) as ref_view, open(output_path, 'r+b') as out:
+        # Copy data pages from reference
+        for page_idx in data_pages:
+            ref_start = page_idx * PAGE_SIZE
+            ref_end = ref_start + PAGE_SIZE
 
-    for page_idx in data_pages:
-        ref_start = page_idx * PAGE_SIZE
-        ref_end = ref_start + PAGE_SIZE
+            if ref_end <= len(ref_data):
+                out.seek(ref_start)
+                out.write(ref_view[ref_start:ref_end])
+                print(f"Copied page {page_idx} from reference")
 
-        if ref_end <= len(ref_data):
-            output_data[ref_start:ref_end] = ref_data[ref_start:ref_end]
-            print(f"Copied page {page_idx} from reference")
+        output_size = out.seek(0, os.SEEK_END)
 
-    Path(output_path).write_bytes(output_data)
     print(f"\nCreated hybrid PDB at {output_path}")
-    print(f"File size: {len(output_data)} bytes")
+    print(f"File size: {output_size} bytes")
 
 def create_reference_with_our_headers(ref_path, test_path, output_path):
     """
     Alternative: Start with reference, replace header pages with ours.
     This tests if our header page content is correct.
     """
-    ref_data = bytearray(Path(ref_path).read_bytes())
-    test_data = bytearray(Path(test_path).read_bytes())
+    header_pages = [0, 1, 3, 5, 7, 9, 11, 13, 15, 17, 19, 21, 23, 25, 27, 29, 31, 33, 35, 37, 39]
 
     # Start with reference
-    output_data = bytearray(ref_data)
+    shutil.copyfile(ref_path, output_path)
 
-    # Copy header pages from test
-    header_pages = [0, 1, 3, 5, 7, 9, 11, 13, 15, 17, 19, 21, 23, 25, 27, 29, 31, 33, 35, 37, 39]
+    with open_pdb(test_path, hint_pages=header_pages) as test_data, \
+         memoryview(test_data) as test_view, open(output_path, 'r+b') as out:
+        output_size = os.fstat(out.fileno()).st_size
 
-    for page_idx in header_pages:
-        test_start = page_idx * PAGE_SIZE
-        test_end = test_start + PAGE_SIZE
+        # Copy header pages from test
+        for page_idx in header_pages:
+            test_start = page_idx * PAGE_SIZE
+            test_end = test_start + PAGE_SIZE
 
-        if test_end <= len(test_data) and test_end <= len(output_data):
-            output_data[test_start:test_end] = test_data[test_start:test_end]
-            print(f"Copied page {page_idx} (header) from test")
+            if test_end <= len(test_data) and test_end <= output_size:
+                out.seek(test_start)
+                out.write(test_view[test_start:test_end])
+                print(f"Copied page {page_idx} (header) from test")
 
-    Path(output_path).write_bytes(output_data)
     print(f"\nCreated hybrid PDB at {output_path}")
-    print(f"File size: {len(output_data)} bytes")
+    print(f"File size: {output_size} bytes")
 
 if __name__ == "__main__":
     import sys
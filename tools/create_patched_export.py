@@ -11,6 +11,8 @@ import os
 import shutil
 from pathlib import Path
 
+from _pdb_common import encode_short_string
+
 PAGE_SIZE = 4096
 HEAP_START = 0x28
 
@@ -22,17 +24,6 @@ def write_file(path, data):
     with open(path, "wb") as f:
         f.write(data)
 
-def encode_short_string(s):
-    """Encode a short ASCII string in DeviceSQL format"""
-    if isinstance(s, str):
-        b = s.encode('utf-8')
-    else:
-        b = s
-    if len(b) > 126:
-        raise ValueError(f"String too long for short format: {len(b)}")
-    header = ((len(b) + 1) << 1) | 1
-    return bytes([header]) + b
-
 def patch_string(data, page_num, heap_offset, new_str, max_len=None):
     """
     Patch a string in place. The new string must fit in the same space.
@@ -5,16 +5,28 @@ This tool takes a known-working reference export and patches only the
 dynamic parts (strings, IDs) while preserving the exact binary structure.
 """
 
+import re
 import struct
 import sys
 import os
 import shutil
 from pathlib import Path
 
+from _pdb_common import encode_short_string
+
 # Constants
 PAGE_SIZE = 4096
 HEAP_START = 0x28
 
+# The reference export paths (from analyzing the reference)
+REFERENCE_VALUES = {
+    'file_path': '/Contents/Rihanna/Unapologetic/06_Rihanna_-_Jump.flac',
+    'filename': '/06_Rihanna_-_Jump.flac',
+    'anlz_path': '/PIONEER/USBANLZ/P03F/0000E2D5/ANLZ0000.DAT',
+}
+# Their DeviceSQL encodings, as searched for in page 2
+REFERENCE_ENCODED = {key: encode_short_string(val) for key, val in REFERENCE_VALUES.items()}
+
 def read_file(path):
     with open(path, "rb") as f:
         return bytearray(f.read())
@@ -23,14 +35,6 @@ def write_file(path, data):
     with open(path, "wb") as f:
         f.write(data)
 
-def encode_short_string(s):
-    """Encode a short ASCII string in DeviceSQL format"""
-    b = s.encode('utf-8') if isinstance(s, str) else s
-    if len(b) > 126:
-        raise ValueError(f"String too long for short format: {len(b)}")
-    header = ((len(b) + 1) << 1) | 1
-    return bytes([header]) + b
-
 def find_string_in_page(page_data, search_str):
     """Find a DeviceSQL-encoded string in page data"""
     encoded = encode_short_string(search_str)
@@ -63,44 +67,39 @@ def patch_pdb_strings(pdb_data, old_values, new_values):
     page2_start = 2 * PAGE_SIZE
     page2 = pdb_data[page2_start:page2_start + PAGE_SIZE]
 
-    changes = []
+    # Key -> encoded old value, for the values that change
+    wanted = {key: encode_short_string(old_val)
+              for key, old_val in old_values.items()
+              if new_values.get(key, old_val) != old_val}
+
+    # Find every occurrence of every pattern in one sweep of page 2; the
+    # string appears twice in the reference (once for each row slot).
+    # The lookahead lets matches overlap, as repeated find() calls would.
+    # No pattern can be a prefix of another: the header byte encodes length.
+    found = {pattern: [] for pattern in wanted.values()}
+    if found:
+        scanner = re.compile(b'(?=(' + b'|'.join(map(re.escape, found)) + b'))')
+        for m in scanner.finditer(page2):
+            found[m.group(1)].append(m.start())
 
-    for key in old_values:
+    changes = []
+    for key, pattern in wanted.items():
         old_val = old_values[key]
-        new_val = new_values.get(key, old_val)
-
-        if old_val == new_val:
-            continue
-
-        # Find the string in page 2
-        encoded_old = encode_short_string(old_val)
-        pos = page2.find(encoded_old)
-
-        if pos == -1:
+        if not found[pattern]:
             print(f"Warning: Could not find '{key}' string: {old_val[:50]}...")
             continue
-
-        # The string appears twice in the reference (once for each row slot)
-        # Find all occurrences
-        offset = 0
-        while True:
-            pos = page2.find(encoded_old, offset)
-            if pos == -1:
-                break
-
-            file_offset = page2_start + pos
-            changes.append((file_offset, old_val, new_val))
-            offset = pos + 1
+        new_val = new_values.get(key, old_val)
+        # Encoded once per key, shared by all of its occurrences
+        new_encoded = encode_short_string(new_val) if len(old_val) == len(new_val) else None
+        changes.extend((page2_start + pos, old_val, new_val, new_encoded)
+                       for pos in found[pattern])
 
     # Apply changes
-    for file_offset, old_val, new_val in changes:
-        if len(old_val) != len(new_val):
+    for file_offset, old_val, new_val, new_encoded in changes:
+        if new_encoded is None:
             print(f"Error: Cannot replace '{old_val[:30]}' with '{new_val[:30]}' - different lengths")
             continue
 
-        old_encoded = encode_short_string(old_val)
-        new_encoded = encode_short_string(new_val)
-
         print(f"Patching at offset {file_offset}: {old_val[:40]}... -> {new_val[:40]}...")
         pdb_data[file_offset:file_offset + len(new_encoded)] = new_encoded
 
@@ -131,17 +130,10 @@ def main():
 
     new_track_path = sys.argv[3]
 
-    # The reference export paths (from analyzing the reference)
-    old_values = {
-        'file_path': '/Contents/Rihanna/Unapologetic/06_Rihanna_-_Jump.flac',
-        'filename': '/06_Rihanna_-_Jump.flac',
-        'anlz_path': '/PIONEER/USBANLZ/P03F/0000E2D5/ANLZ0000.DAT',
-    }
-
     # New values would need to match the new track
     # For now, just demonstrate the patching capability
     print("Reference paths in PDB:")
-    for k, v in old_values.items():
+    for k, v in REFERENCE_VALUES.items():
         print(f"  {k}: {v}")
 
     # Read and patch PDB
@@ -152,8 +144,7 @@ def main():
     page2_start = 2 * PAGE_SIZE
     page2 = pdb_data[page2_start:page2_start + PAGE_SIZE]
 
-    for key, val in old_values.items():
-        encoded = encode_short_string(val)
+    for key, encoded in REFERENCE_ENCODED.items():
         count = page2.count(encoded)
         print(f"Found '{key}' string {count} time(s) in page 2")
 
@@ -3,12 +3,22 @@
 PDB File Analyzer - Compare and analyze Pioneer export.pdb files
 """
 
+import io
 import struct
 import sys
+from collections import namedtuple
 from pathlib import Path
 
+from _pdb_common import (FULL_PAGE_HEADER, FULL_PAGE_HEADER_FIELDS, MADV_SEQUENTIAL,
+                         ROW_GROUP, STRING_OFFSETS_COUNT, TRACK_HEADER, TRACK_HEADER_FIELDS,
+                         byte_diffs, differing_pages, open_pdb, set_bits)
+
 PAGE_SIZE = 4096
 
+# File header (first 0x1c bytes) and the 16-byte table pointers after it
+FILE_HEADER = struct.Struct('<7I')
+TABLE_POINTER = struct.Struct('<4I')
+
 TABLE_NAMES = {
     0: "Tracks",
     1: "Genres",
@@ -33,9 +43,24 @@ TABLE_NAMES = {
 }
 
 
+# Track row header field names, in TRACK_HEADER order, under this tool's labels
+TRACK_FIELD_RENAMES = {'original_artist_id': 'orig_artist_id', 'id': 'track_id'}
+TRACK_ROW_FIELDS = tuple(TRACK_FIELD_RENAMES.get(name, name) for _, _, name in TRACK_HEADER_FIELDS)
+TrackRow = namedtuple('TrackRow', TRACK_ROW_FIELDS + ('string_offsets', 'raw_header'))
+
+# Track header followed by its string offsets, read in one unpack
+TRACK_ROW = struct.Struct(TRACK_HEADER.format + f'{STRING_OFFSETS_COUNT}H')
+
+
+def type_name(table_type):
+    """Name of a table type; the fallback label is only built for unknown types"""
+    name = TABLE_NAMES.get(table_type)
+    return name if name is not None else f"Type{table_type}"
+
+
 def read_file(path):
-    with open(path, "rb") as f:
-        return f.read()
+    # Read-only mapping; the tool walks pages front to back
+    return open_pdb(path, MADV_SEQUENTIAL)
 
 
 def parse_header(data):
@@ -54,21 +79,13 @@ def parse_header(data):
     # 0x14: u32 sequence
     # 0x18: u32 gap
 
-    page_size = struct.unpack_from('<I', header, 0x04)[0]
-    num_tables = struct.unpack_from('<I', header, 0x08)[0]
-    next_unused = struct.unpack_from('<I', header, 0x0c)[0]
-    unknown1 = struct.unpack_from('<I', header, 0x10)[0]
-    sequence = struct.unpack_from('<I', header, 0x14)[0]
-    gap = struct.unpack_from('<I', header, 0x18)[0]
+    (_, page_size, num_tables, next_unused, unknown1, sequence,
+     gap) = FILE_HEADER.unpack_from(header, 0)
 
     # Table pointers start at 0x1c
     tables = []
-    for i in range(num_tables):
-        offset = 0x1c + i * 16
-        table_type = struct.unpack_from('<I', header, offset)[0]
-        empty_candidate = struct.unpack_from('<I', header, offset + 4)[0]
-        first_page = struct.unpack_from('<I', header, offset + 8)[0]
-        last_page = struct.unpack_from('<I', header, offset + 12)[0]
+    pointer_area = header[0x1c:0x1c + num_tables * TABLE_POINTER.size]
+    for table_type, empty_candidate, first_page, last_page in TABLE_POINTER.iter_unpack(pointer_area):
         tables.append({
             'type': table_type,
             'name': TABLE_NAMES.get(table_type, f"Unknown({table_type})"),
@@ -94,7 +111,8 @@ def parse_page_header(data, page_idx):
     if offset + PAGE_SIZE > len(data):
         return None
 
-    page = data[offset:offset + PAGE_SIZE]
+    # Views into the file rather than copies of the page
+    page = memoryview(data)[offset:offset + PAGE_SIZE]
 
     # Page header structure (0x28 = 40 bytes)
     # 0x00: u32 padding (0)
@@ -114,26 +132,10 @@ def parse_page_header(data, page_idx):
     # 0x24: u16 unknown6
     # 0x26: u16 unknown7
 
-    return {
-        'padding': struct.unpack_from('<I', page, 0x00)[0],
-        'page_index': struct.unpack_from('<I', page, 0x04)[0],
-        'table_type': struct.unpack_from('<I', page, 0x08)[0],
-        'next_page': struct.unpack_from('<I', page, 0x0c)[0],
-        'unknown1': struct.unpack_from('<I', page, 0x10)[0],
-        'unknown2': struct.unpack_from('<I', page, 0x14)[0],
-        'num_rows_small': page[0x18],
-        'unknown3': page[0x19],
-        'unknown4': page[0x1a],
-        'page_flags': page[0x1b],
-        'free_size': struct.unpack_from('<H', page, 0x1c)[0],
-        'used_size': struct.unpack_from('<H', page, 0x1e)[0],
-        'unknown5': struct.unpack_from('<H', page, 0x20)[0],
-        'num_rows_large': struct.unpack_from('<H', page, 0x22)[0],
-        'unknown6': struct.unpack_from('<H', page, 0x24)[0],
-        'unknown7': struct.unpack_from('<H', page, 0x26)[0],
-        'raw_header': page[:0x28],
-        'raw_page': page,
-    }
+    result = dict(zip(FULL_PAGE_HEADER_FIELDS, FULL_PAGE_HEADER.unpack_from(data, offset)))
+    result['raw_header'] = page[:0x28]
+    result['raw_page'] = page
+    return result
 
 
 def parse_row_groups(page_data, num_rows):
@@ -141,30 +143,24 @@ def parse_row_groups(page_data, num_rows):
     if num_rows == 0:
         return []
 
-    num_groups = (num_rows + 15) // 16
+    # A bogus row count can claim more groups than the page holds
+    num_groups = min((num_rows + 15) // 16, PAGE_SIZE // ROW_GROUP.size)
     groups = []
 
-    for g in range(num_groups):
-        # Row groups are 36 bytes each, stored at end of page growing backwards
-        group_offset = PAGE_SIZE - (g + 1) * 36
-        group = page_data[group_offset:group_offset + 36]
-
-        # Format: 16 offsets (32 bytes) + flags (2 bytes) + unknown (2 bytes)
-        # Offsets stored slot 15 first, slot 0 last
-        offsets = []
-        for slot in range(16):
-            # Slot 15 is first, slot 0 is last
-            off = struct.unpack_from('<H', group, (15 - slot) * 2)[0]
-            offsets.append(off)
-
-        flags = struct.unpack_from('<H', group, 32)[0]
-        unknown = struct.unpack_from('<H', group, 34)[0]
+    # Row groups are 36 bytes each, stored at end of page growing backwards,
+    # so the whole area is unpacked in one pass and walked from its end
+    area = page_data[PAGE_SIZE - num_groups * ROW_GROUP.size:PAGE_SIZE]
+    group_offset = PAGE_SIZE
 
+    # Format: 16 offsets (32 bytes) + flags (2 bytes) + unknown (2 bytes)
+    # Offsets stored slot 15 first, slot 0 last
+    for words in reversed(list(ROW_GROUP.iter_unpack(area))):
+        group_offset -= ROW_GROUP.size
         groups.append({
-            'offsets': offsets,
-            'flags': flags,
-            'unknown': unknown,
-            'raw': group,
+            'offsets': list(words[15::-1]),
+            'flags': words[16],
+            'unknown': words[17],
+            'raw': page_data[group_offset:group_offset + ROW_GROUP.size],
         })
 
     return groups
@@ -175,95 +171,53 @@ def analyze_track_row(page_data, row_offset):
     # Actual offset in page data is row_offset + 0x28 (after page header)
     start = 0x28 + row_offset
 
-    if start + 0x5E > len(page_data):
+    if start + TRACK_ROW.size > len(page_data):
         return None
 
-    row = page_data[start:]
-
-    # Track header (94 bytes = 0x5E)
-    result = {
-        'subtype': struct.unpack_from('<H', row, 0x00)[0],
-        'index_shift': struct.unpack_from('<H', row, 0x02)[0],
-        'bitmask': struct.unpack_from('<I', row, 0x04)[0],
-        'sample_rate': struct.unpack_from('<I', row, 0x08)[0],
-        'composer_id': struct.unpack_from('<I', row, 0x0c)[0],
-        'file_size': struct.unpack_from('<I', row, 0x10)[0],
-        'u2': struct.unpack_from('<I', row, 0x14)[0],
-        'u3': struct.unpack_from('<H', row, 0x18)[0],
-        'u4': struct.unpack_from('<H', row, 0x1a)[0],
-        'artwork_id': struct.unpack_from('<I', row, 0x1c)[0],
-        'key_id': struct.unpack_from('<I', row, 0x20)[0],
-        'orig_artist_id': struct.unpack_from('<I', row, 0x24)[0],
-        'label_id': struct.unpack_from('<I', row, 0x28)[0],
-        'remixer_id': struct.unpack_from('<I', row, 0x2c)[0],
-        'bitrate': struct.unpack_from('<I', row, 0x30)[0],
-        'track_number': struct.unpack_from('<I', row, 0x34)[0],
-        'tempo': struct.unpack_from('<I', row, 0x38)[0],
-        'genre_id': struct.unpack_from('<I', row, 0x3c)[0],
-        'album_id': struct.unpack_from('<I', row, 0x40)[0],
-        'artist_id': struct.unpack_from('<I', row, 0x44)[0],
-        'track_id': struct.unpack_from('<I', row, 0x48)[0],
-        'disc_number': struct.unpack_from('<H', row, 0x4c)[0],
-        'play_count': struct.unpack_from('<H', row, 0x4e)[0],
-        'year': struct.unpack_from('<H', row, 0x50)[0],
-        'sample_depth': struct.unpack_from('<H', row, 0x52)[0],
-        'duration': struct.unpack_from('<H', row, 0x54)[0],
-        'u5': struct.unpack_from('<H', row, 0x56)[0],
-        'color_id': row[0x58],
-        'rating': row[0x59],
-        'file_type': struct.unpack_from('<H', row, 0x5a)[0],
-        'u7': struct.unpack_from('<H', row, 0x5c)[0],
-    }
-
-    # String offsets (21 x u16)
-    string_offsets = []
-    for i in range(21):
-        off = struct.unpack_from('<H', row, 0x5e + i * 2)[0]
-        string_offsets.append(off)
-
-    result['string_offsets'] = string_offsets
-    result['raw_header'] = row[:0x88]  # Header + string offsets
-
-    return result
+    # Track header (94 bytes = 0x5E), then 21 u16 string offsets
+    vals = TRACK_ROW.unpack_from(page_data, start)
+    return TrackRow(*vals[:len(TRACK_ROW_FIELDS)],
+                    string_offsets=list(vals[len(TRACK_ROW_FIELDS):]),
+                    raw_header=page_data[start:start + TRACK_ROW.size])
 
 
-def print_file_info(path, data):
+def print_file_info(path, data, out=sys.stdout):
     """Print detailed file information"""
     header = parse_header(data)
     if not header:
-        print(f"ERROR: Failed to parse header for {path}")
+        print(f"ERROR: Failed to parse header for {path}", file=out)
         return
 
     num_pages = len(data) // PAGE_SIZE
 
-    print(f"\n{'='*60}")
-    print(f"FILE: {path}")
-    print(f"{'='*60}")
-    print(f"Size: {len(data)} bytes ({num_pages} pages)")
-    print(f"Page size: {header['page_size']}")
-    print(f"Num tables: {header['num_tables']}")
-    print(f"Next unused page: {header['next_unused_page']}")
-    print(f"Sequence: {header['sequence']}")
+    print(f"\n{'='*60}", file=out)
+    print(f"FILE: {path}", file=out)
+    print(f"{'='*60}", file=out)
+    print(f"Size: {len(data)} bytes ({num_pages} pages)", file=out)
+    print(f"Page size: {header['page_size']}", file=out)
+    print(f"Num tables: {header['num_tables']}", file=out)
+    print(f"Next unused page: {header['next_unused_page']}", file=out)
+    print(f"Sequence: {header['sequence']}", file=out)
 
-    print(f"\n--- Table Pointers ---")
+    print(f"\n--- Table Pointers ---", file=out)
     for t in header['tables']:
-        print(f"  {t['name']:20s}: type={t['type']:2d}, first={t['first_page']:2d}, last={t['last_page']:2d}, empty_cand={t['empty_candidate']:2d}")
+        print(f"  {t['name']:20s}: type={t['type']:2d}, first={t['first_page']:2d}, last={t['last_page']:2d}, empty_cand={t['empty_candidate']:2d}", file=out)
 
     # Analyze key pages
-    print(f"\n--- Page Details ---")
+    print(f"\n--- Page Details ---", file=out)
     for page_idx in range(min(num_pages, 55)):
         ph = parse_page_header(data, page_idx)
         if not ph:
             continue
 
         # Skip empty pages
-        if ph['page_index'] == 0 and ph['table_type'] == 0 and ph['next_page'] == 0:
+        if ph['page_index'] == 0 and ph['type'] == 0 and ph['next_page'] == 0:
             continue
 
-        table_name = TABLE_NAMES.get(ph['table_type'], f"Type{ph['table_type']}")
+        table_name = type_name(ph['type'])
         row_info = f"rows_s={ph['num_rows_small']}, rows_l={ph['num_rows_large']}" if ph['page_flags'] in [0x24, 0x34] else ""
 
-        print(f"  Page {page_idx:2d}: {table_name:18s} next={ph['next_page']:2d} flags=0x{ph['page_flags']:02x} free={ph['free_size']:4d} used={ph['used_size']:4d} {row_info}")
+        print(f"  Page {page_idx:2d}: {table_name:18s} next={ph['next_page']:2d} flags=0x{ph['page_flags']:02x} free={ph['free_size']:4d} used={ph['used_size']:4d} {row_info}", file=out)
 
     return header
 
@@ -291,44 +245,42 @@ def analyze_tracks_page(data, page_idx):
             print(f"    Offsets: {g['offsets'][:num_rows] if num_rows <= 16 else g['offsets']}")
 
             # Analyze each row
-            for slot in range(min(num_rows, 16)):
-                if g['flags'] & (1 << slot):
-                    row_offset = g['offsets'][slot]
-                    track = analyze_track_row(page_data, row_offset)
-                    if track:
-                        print(f"    Row {slot}: offset=0x{row_offset:04x} track_id={track['track_id']} artist_id={track['artist_id']} album_id={track['album_id']}")
-                        print(f"            subtype=0x{track['subtype']:04x} index_shift=0x{track['index_shift']:04x} bitmask=0x{track['bitmask']:08x}")
-                        print(f"            tempo={track['tempo']} duration={track['duration']} file_type={track['file_type']}")
-                        print(f"            string_offsets={track['string_offsets']}")
-
-
-def compare_pages(data1, data2, page_idx):
+            for slot in set_bits(g['flags']):
+                if slot >= num_rows:
+                    break
+                row_offset = g['offsets'][slot]
+                track = analyze_track_row(page_data, row_offset)
+                if track:
+                    print(f"    Row {slot}: offset=0x{row_offset:04x} track_id={track.track_id} artist_id={track.artist_id} album_id={track.album_id}")
+                    print(f"            subtype=0x{track.subtype:04x} index_shift=0x{track.index_shift:04x} bitmask=0x{track.bitmask:08x}")
+                    print(f"            tempo={track.tempo} duration={track.duration} file_type={track.file_type}")
+                    print(f"            string_offsets={track.string_offsets}")
+
+
+def compare_pages(data1, data2, page_idx, out=sys.stdout):
     """Compare a specific page between two files"""
     off = page_idx * PAGE_SIZE
 
     if off + PAGE_SIZE > len(data1) or off + PAGE_SIZE > len(data2):
-        print(f"Page {page_idx}: One or both files don't have this page")
+        print(f"Page {page_idx}: One or both files don't have this page", file=out)
         return
 
     page1 = data1[off:off + PAGE_SIZE]
     page2 = data2[off:off + PAGE_SIZE]
 
     if page1 == page2:
-        print(f"Page {page_idx}: IDENTICAL")
+        print(f"Page {page_idx}: IDENTICAL", file=out)
         return
 
     # Find differences
-    diffs = []
-    for i in range(PAGE_SIZE):
-        if page1[i] != page2[i]:
-            diffs.append((i, page1[i], page2[i]))
+    diffs = byte_diffs(page1, page2)
 
-    print(f"Page {page_idx}: {len(diffs)} byte differences")
+    print(f"Page {page_idx}: {len(diffs)} byte differences", file=out)
 
     # Group consecutive differences
     if len(diffs) <= 50:
         for offset, b1, b2 in diffs[:50]:
-            print(f"  0x{offset:04x}: 0x{b1:02x} vs 0x{b2:02x}")
+            print(f"  0x{offset:04x}: 0x{b1:02x} vs 0x{b2:02x}", file=out)
 
 
 def main():
@@ -339,7 +291,10 @@ def main():
     path1 = Path(sys.argv[1])
     data1 = read_file(path1)
 
-    header1 = print_file_info(path1, data1)
+    # Reports are built in memory and written with one call each
+    out = io.StringIO()
+    header1 = print_file_info(path1, data1, out)
+    sys.stdout.write(out.getvalue())
 
     # Always analyze tracks page 2
     analyze_tracks_page(data1, 2)
@@ -347,19 +302,25 @@ def main():
     if len(sys.argv) >= 3 and not sys.argv[2].startswith('--'):
         path2 = Path(sys.argv[2])
         data2 = read_file(path2)
-        header2 = print_file_info(path2, data2)
+        out = io.StringIO()
+        header2 = print_file_info(path2, data2, out)
 
         # Compare specific pages
         if '--compare-page' in sys.argv:
             idx = sys.argv.index('--compare-page')
             page_num = int(sys.argv[idx + 1])
-            compare_pages(data1, data2, page_num)
+            compare_pages(data1, data2, page_num, out)
         else:
             # Compare all pages up to smaller file
             num_pages = min(len(data1), len(data2)) // PAGE_SIZE
-            print(f"\n--- Comparing {num_pages} pages ---")
+            print(f"\n--- Comparing {num_pages} pages ---", file=out)
+            diff_pages = differing_pages(data1, data2, num_pages)
             for p in range(num_pages):
-                compare_pages(data1, data2, p)
+                if p in diff_pages:
+                    compare_pages(data1, data2, p, out)
+                else:
+                    print(f"Page {p}: IDENTICAL", file=out)
+        sys.stdout.write(out.getvalue())
 
 
 if __name__ == '__main__':
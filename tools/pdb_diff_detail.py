@@ -3,10 +3,12 @@
 Detailed PDB page comparison - shows byte-by-byte differences with context
 """
 
-import struct
 import sys
+from bisect import bisect_right
 from pathlib import Path
 
+from _pdb_common import byte_diffs, differing_pages, open_pdb, read_u32
+
 PAGE_SIZE = 4096
 
 TABLE_NAMES = {
@@ -32,32 +34,39 @@ TABLE_NAMES = {
     19: "History",
 }
 
+# Page header fields by offset, for naming a differing header byte
+HEADER_FIELDS = (
+    (0x00, "padding"),
+    (0x04, "page_index"),
+    (0x08, "table_type"),
+    (0x0c, "next_page"),
+    (0x10, "unknown1"),
+    (0x14, "unknown2"),
+    (0x18, "num_rows_small"),
+    (0x19, "unknown3"),
+    (0x1a, "unknown4"),
+    (0x1b, "page_flags"),
+    (0x1c, "free_size"),
+    (0x1e, "used_size"),
+    (0x20, "unknown5"),
+    (0x22, "num_rows_large"),
+    (0x24, "unknown6"),
+    (0x26, "unknown7"),
+)
+HEADER_FIELD_OFFSETS = [off for off, _ in HEADER_FIELDS]
+
+# Hex dump cells for every byte value, bracketed when the byte differs
+SAME_CELLS = tuple(f"  {b:02x} " for b in range(256))
+DIFF_CELLS = tuple(f" [{b:02x}]" for b in range(256))
+
 
 def describe_offset(offset, page_idx):
     """Try to describe what a page offset represents"""
     if offset < 0x28:
         # Page header
-        fields = {
-            0x00: "padding",
-            0x04: "page_index",
-            0x08: "table_type",
-            0x0c: "next_page",
-            0x10: "unknown1",
-            0x14: "unknown2",
-            0x18: "num_rows_small",
-            0x19: "unknown3",
-            0x1a: "unknown4",
-            0x1b: "page_flags",
-            0x1c: "free_size",
-            0x1e: "used_size",
-            0x20: "unknown5",
-            0x22: "num_rows_large",
-            0x24: "unknown6",
-            0x26: "unknown7",
-        }
-        for field_off, name in sorted(fields.items(), reverse=True):
-            if offset >= field_off:
-                return f"header.{name}+{offset - field_off}"
+        i = bisect_right(HEADER_FIELD_OFFSETS, offset) - 1
+        field_off, name = HEADER_FIELDS[i]
+        return f"header.{name}+{offset - field_off}"
 
     return f"heap+0x{offset - 0x28:03x}"
 
@@ -70,36 +79,29 @@ def compare_pages_detailed(data1, data2, page_idx):
         print(f"Page {page_idx}: One or both files don't have this page")
         return
 
+    # With memoryview inputs these are views, not copies
     page1 = data1[off:off + PAGE_SIZE]
     page2 = data2[off:off + PAGE_SIZE]
 
-    if page1 == page2:
+    # Find all differences
+    diffs = byte_diffs(page1, page2)
+    if not diffs:
         print(f"Page {page_idx}: IDENTICAL")
         return
 
     # Get table type for context
-    table_type = struct.unpack_from('<I', page1, 0x08)[0]
+    table_type = read_u32(page1, 0x08)
     table_name = TABLE_NAMES.get(table_type, f"Type{table_type}")
 
-    # Find all differences
-    diffs = []
-    for i in range(PAGE_SIZE):
-        if page1[i] != page2[i]:
-            diffs.append((i, page1[i], page2[i]))
-
     print(f"\n{'='*70}")
     print(f"Page {page_idx} ({table_name}): {len(diffs)} byte differences")
     print(f"{'='*70}")
 
-    # Group consecutive differences
-    groups = []
-    current_group = None
+    diff_offsets = {offset for offset, _, _ in diffs}
 
-    for offset, b1, b2 in diffs:
-        if current_group is None or offset > current_group[-1][0] + 4:
-            current_group = []
-            groups.append(current_group)
-        current_group.append((offset, b1, b2))
+    # Group consecutive differences: a new group starts after a gap of more than 4 bytes
+    breaks = [k for k in range(1, len(diffs)) if diffs[k][0] > diffs[k - 1][0] + 4]
+    groups = [diffs[a:b] for a, b in zip([0] + breaks, breaks + [len(diffs)])]
 
     for group in groups:
         start_offset = group[0][0]
@@ -116,24 +118,18 @@ def compare_pages_detailed(data1, data2, page_idx):
         for chunk_start in range(ctx_start, ctx_end, 16):
             chunk_end = min(chunk_start + 16, ctx_end)
 
-            hex1 = ""
-            hex2 = ""
-            diff_markers = ""
-
-            for i in range(chunk_start, chunk_end):
-                b1 = page1[i]
-                b2 = page2[i]
+            # Context lines without a differing byte are never printed
+            if diff_offsets.isdisjoint(range(chunk_start, chunk_end)):
+                continue
 
-                if b1 != b2:
-                    hex1 += f" [{b1:02x}]"
-                    hex2 += f" [{b2:02x}]"
-                else:
-                    hex1 += f"  {b1:02x} "
-                    hex2 += f"  {b2:02x} "
+            # One tolist() per line instead of two indexed reads per byte
+            line = list(zip(page1[chunk_start:chunk_end].tolist(),
+                            page2[chunk_start:chunk_end].tolist()))
+            hex1 = "".join((DIFF_CELLS if b1 != b2 else SAME_CELLS)[b1] for b1, b2 in line)
+            hex2 = "".join((DIFF_CELLS if b1 != b2 else SAME_CELLS)[b2] for b1, b2 in line)
 
-            if any(page1[i] != page2[i] for i in range(chunk_start, chunk_end)):
-                print(f"    0x{chunk_start:04x}: File1: {hex1}")
-                print(f"    0x{chunk_start:04x}: File2: {hex2}")
+            print(f"    0x{chunk_start:04x}: File1: {hex1}")
+            print(f"    0x{chunk_start:04x}: File2: {hex2}")
 
 
 def main():
@@ -144,26 +140,24 @@ def main():
     path1 = Path(sys.argv[1])
     path2 = Path(sys.argv[2])
 
-    data1 = path1.read_bytes()
-    data2 = path2.read_bytes()
+    # Read-only mappings; only the differing pages are ever touched closely
+    data1 = open_pdb(path1)
+    data2 = open_pdb(path2)
 
     # Specific pages to compare, or find all differing pages
     if len(sys.argv) > 3:
         pages = [int(arg) for arg in sys.argv[3:]]
     else:
         num_pages = min(len(data1), len(data2)) // PAGE_SIZE
-        pages = []
-        for p in range(num_pages):
-            off = p * PAGE_SIZE
-            if data1[off:off + PAGE_SIZE] != data2[off:off + PAGE_SIZE]:
-                pages.append(p)
+        pages = sorted(differing_pages(data1, data2, num_pages))
 
     print(f"Comparing: {path1} vs {path2}")
     print(f"File sizes: {len(data1)} vs {len(data2)} bytes")
     print(f"Pages with differences: {pages}")
 
+    view1, view2 = memoryview(data1), memoryview(data2)
     for page_idx in pages:
-        compare_pages_detailed(data1, data2, page_idx)
+        compare_pages_detailed(view1, view2, page_idx)
 
 
 if __name__ == '__main__':
@@ -10,14 +10,42 @@ Example:
   pdb_hybrid.py reference.pdb ours.pdb hybrid.pdb 2 4 6
 """
 
+import os
+import shutil
 import sys
 from pathlib import Path
 
 PAGE_SIZE = 4096
 
 
-def create_hybrid(base_path, donor_path, output_path, pages_to_swap):
-    """Create a hybrid PDB by swapping specific pages"""
+def copy_page(src, dst, offset):
+    """Copy one page between two open files at the same offset
+
+    copy_file_range keeps the copy inside the kernel; where it is missing
+    or refuses the pair of files the page goes through a read and a write.
+    """
+    if hasattr(os, 'copy_file_range'):
+        try:
+            if os.copy_file_range(src.fileno(), dst.fileno(), PAGE_SIZE, offset, offset) == PAGE_SIZE:
+                return
+        except OSError:
+            pass
+    src.seek(offset)
+    dst.seek(offset)
+    dst.write(src.read(PAGE_SIZE))
+
+
+def same_file(a, b):
+    """True when both paths exist and name the same file"""
+    return os.path.exists(a) and os.path.exists(b) and os.path.samefile(a, b)
+
+
+def create_hybrid_in_memory(base_path, donor_path, output_path, pages_to_swap):
+    """Create a hybrid PDB with both inputs read into memory first
+
+    Used when the output path is also one of the inputs, where copying the
+    base over the output would clobber an input before it is read.
+    """
     base_data = bytearray(Path(base_path).read_bytes())
     donor_data = Path(donor_path).read_bytes()
 
@@ -26,25 +54,59 @@ def create_hybrid(base_path, donor_path, output_path, pages_to_swap):
     print(f"Swapping pages: {pages_to_swap}")
 
     for page_num in pages_to_swap:
-        base_offset = page_num * PAGE_SIZE
-        donor_offset = page_num * PAGE_SIZE
+        offset = page_num * PAGE_SIZE
 
-        if base_offset + PAGE_SIZE > len(base_data):
+        if offset + PAGE_SIZE > len(base_data):
             print(f"  Page {page_num}: Extending base file")
-            base_data.extend(b'\x00' * (base_offset + PAGE_SIZE - len(base_data)))
+            base_data.extend(b'\x00' * (offset + PAGE_SIZE - len(base_data)))
 
-        if donor_offset + PAGE_SIZE > len(donor_data):
+        if offset + PAGE_SIZE > len(donor_data):
             print(f"  Page {page_num}: SKIP (donor doesn't have this page)")
             continue
 
-        donor_page = donor_data[donor_offset:donor_offset + PAGE_SIZE]
-        base_data[base_offset:base_offset + PAGE_SIZE] = donor_page
+        base_data[offset:offset + PAGE_SIZE] = donor_data[offset:offset + PAGE_SIZE]
         print(f"  Page {page_num}: Swapped")
 
     Path(output_path).write_bytes(base_data)
     print(f"Output: {output_path} ({len(base_data)} bytes)")
 
 
+def create_hybrid(base_path, donor_path, output_path, pages_to_swap):
+    """Create a hybrid PDB by swapping specific pages"""
+    if same_file(output_path, base_path) or same_file(output_path, donor_path):
+        create_hybrid_in_memory(base_path, donor_path, output_path, pages_to_swap)
+        return
+
+    base_size = os.path.getsize(base_path)
+    donor_size = os.path.getsize(donor_path)
+
+    print(f"Base: {base_path} ({base_size} bytes)")
+    print(f"Donor: {donor_path} ({donor_size} bytes)")
+    print(f"Swapping pages: {pages_to_swap}")
+
+    # Start from a copy of the base; only the swapped pages are written
+    shutil.copyfile(base_path, output_path)
+
+    with open(donor_path, 'rb') as donor, open(output_path, 'r+b') as out:
+        output_size = base_size
+        for page_num in pages_to_swap:
+            offset = page_num * PAGE_SIZE
+
+            if offset + PAGE_SIZE > output_size:
+                print(f"  Page {page_num}: Extending base file")
+                output_size = offset + PAGE_SIZE
+                out.truncate(output_size)
+
+            if offset + PAGE_SIZE > donor_size:
+                print(f"  Page {page_num}: SKIP (donor doesn't have this page)")
+                continue
+
+            copy_page(donor, out, offset)
+            print(f"  Page {page_num}: Swapped")
+
+    print(f"Output: {output_path} ({output_size} bytes)")
+
+
 def main():
     if len(sys.argv) < 5:
         print(__doc__)
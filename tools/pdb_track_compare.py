@@ -8,64 +8,44 @@ import sys
 import struct
 from pathlib import Path
 
+from _pdb_common import (
+    HEAP_START, MADV_SEQUENTIAL, PAGE_SIZE, TRACK_HEADER_FIELDS, build_struct, get_row_offsets,
+    open_pdb,
+)
+
+# Page header fields: type @0x08, num_rows_small @0x18, page_flags @0x1b.
+# One whole page per record, so iter_unpack walks every page header in C
+PAGE_RECORD = struct.Struct(f'<8xI12xB2xB{PAGE_SIZE - 0x1c}x')
+
+# Track row header (0x5e bytes) from the shared field table; subtype and
+# bitmask are kept as raw bytes
+RAW_FIELDS = {'subtype': '2s', 'bitmask': '4s'}
+TRACK_ROW = build_struct([(off, RAW_FIELDS.get(name, code), name)
+                          for off, code, name in TRACK_HEADER_FIELDS], 0x5e)
+TRACK_ROW_FIELDS = tuple(name for _, _, name in TRACK_HEADER_FIELDS)
+
 def find_track_rows(data: bytes) -> list:
-    """Find all track rows by searching for subtype 0x0024"""
+    """Find all track rows through the row index of each Tracks data page"""
     rows = []
-    # Track rows start with subtype 0x0024 (little-endian)
-    marker = b'\x24\x00'
-
-    offset = 0
-    while True:
-        pos = data.find(marker, offset)
-        if pos == -1:
-            break
-        # Basic validation: check if this looks like a track row
-        # Track rows are at least 0x9e bytes long
-        if pos + 0x9e <= len(data):
-            rows.append(pos)
-        offset = pos + 1
+    num_pages = len(data) // PAGE_SIZE
+    pages = PAGE_RECORD.iter_unpack(memoryview(data)[:num_pages * PAGE_SIZE])
+    for page_idx, (table_type, num_rows_small, page_flags) in enumerate(pages):
+        # Tracks are table type 0; header pages have page_flags & 0x40 set
+        if table_type != 0 or page_flags & 0x40:
+            continue
+        page_offset = page_idx * PAGE_SIZE
+        rows.extend(page_offset + HEAP_START + off
+                    for off in get_row_offsets(data, page_offset, num_rows_small))
 
     return rows
 
 def decode_track_row(data: bytes, offset: int) -> dict:
     """Decode track row fields"""
-    row = data[offset:offset + 0x200]  # Read up to 512 bytes
-
-    result = {
-        'offset': hex(offset),
-        'subtype': row[0:2].hex(),
-        'index_shift': struct.unpack('<H', row[2:4])[0],
-        'bitmask': row[4:8].hex(),
-        'sample_rate': struct.unpack('<I', row[8:12])[0],
-        'composer_id': struct.unpack('<I', row[12:16])[0],
-        'file_size': struct.unpack('<I', row[16:20])[0],
-        'u2': struct.unpack('<I', row[20:24])[0],
-        'u3': struct.unpack('<H', row[24:26])[0],
-        'u4': struct.unpack('<H', row[26:28])[0],
-        'artwork_id': struct.unpack('<I', row[28:32])[0],
-        'key_id': struct.unpack('<I', row[32:36])[0],
-        'orig_artist_id': struct.unpack('<I', row[36:40])[0],
-        'label_id': struct.unpack('<I', row[40:44])[0],
-        'remixer_id': struct.unpack('<I', row[44:48])[0],
-        'bitrate': struct.unpack('<I', row[48:52])[0],
-        'track_number': struct.unpack('<I', row[52:56])[0],
-        'tempo': struct.unpack('<I', row[56:60])[0],  # BPM * 100
-        'genre_id': struct.unpack('<I', row[60:64])[0],
-        'album_id': struct.unpack('<I', row[64:68])[0],
-        'artist_id': struct.unpack('<I', row[68:72])[0],
-        'id': struct.unpack('<I', row[72:76])[0],
-        'disc_number': struct.unpack('<H', row[76:78])[0],
-        'play_count': struct.unpack('<H', row[78:80])[0],
-        'year': struct.unpack('<H', row[80:82])[0],
-        'sample_depth': struct.unpack('<H', row[82:84])[0],
-        'duration': struct.unpack('<H', row[84:86])[0],
-        'u5': struct.unpack('<H', row[86:88])[0],
-        'color_id': row[88],
-        'rating': row[89],
-        'u6': struct.unpack('<H', row[90:92])[0],
-        'u7': struct.unpack('<H', row[92:94])[0],
-        # String offsets start at 0x5e (94)
-    }
+    result = {'offset': hex(offset)}
+    result.update(zip(TRACK_ROW_FIELDS, TRACK_ROW.unpack_from(data, offset)))
+    result['subtype'] = result['subtype'].hex()
+    result['bitmask'] = result['bitmask'].hex()
+    # String offsets start at 0x5e (94)
 
     return result
 
@@ -75,36 +55,37 @@ def main():
         sys.exit(1)
 
     path1 = Path(sys.argv[1])
-    data1 = path1.read_bytes()
+    data1 = open_pdb(path1, MADV_SEQUENTIAL)
 
     rows1 = find_track_rows(data1)
     print(f"File: {path1}")
     print(f"Found {len(rows1)} potential track rows")
 
-    for i, offset in enumerate(rows1[:5]):  # First 5 rows
+    # Rows are decoded once; the bitmask comparison reuses the first one
+    decoded1 = [decode_track_row(data1, offset) for offset in rows1[:5]]  # First 5 rows
+    for i, row in enumerate(decoded1):
         print(f"\n=== Track Row {i} ===")
-        row = decode_track_row(data1, offset)
         for key, value in row.items():
             print(f"  {key}: {value}")
 
     if len(sys.argv) >= 3:
         path2 = Path(sys.argv[2])
-        data2 = path2.read_bytes()
+        data2 = open_pdb(path2, MADV_SEQUENTIAL)
         rows2 = find_track_rows(data2)
 
         print(f"\n\nFile: {path2}")
         print(f"Found {len(rows2)} potential track rows")
 
-        for i, offset in enumerate(rows2[:5]):
+        decoded2 = [decode_track_row(data2, offset) for offset in rows2[:5]]
+        for i, row in enumerate(decoded2):
             print(f"\n=== Track Row {i} ===")
-            row = decode_track_row(data2, offset)
             for key, value in row.items():
                 print(f"  {key}: {value}")
 
         if rows1 and rows2:
             print("\n\n=== BITMASK COMPARISON ===")
-            row1 = decode_track_row(data1, rows1[0])
-            row2 = decode_track_row(data2, rows2[0])
+            row1 = decoded1[0]
+            row2 = decoded2[0]
             print(f"Reference bitmask: {row1['bitmask']}")
             print(f"Our bitmask:       {row2['bitmask']}")
 
@@ -8,13 +8,29 @@ and can compare against reference exports.
 
 import struct
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional, Tuple
 
+from _pdb_common import MADV_SEQUENTIAL, byte_diffs, differing_pages, open_pdb, packed_row_groups
+
 PAGE_SIZE = 4096
 HEAP_START = 0x28  # 40 bytes
 
+# page_flags values seen in exports; data pages carry rows and row groups
+VALID_PAGE_FLAGS = frozenset((0x24, 0x34, 0x44, 0x64))
+DATA_PAGE_FLAGS = frozenset((0x24, 0x34))
+
+# File header, 0x04..0x1c, followed by num_tables table pointers
+FILE_HEADER = struct.Struct('<4x6I')
+TABLE_POINTER = struct.Struct('<4I')
+
+# Page header values, 0x04..0x28, in PageHeader field order
+PAGE_HEADER_VALUES = struct.Struct('<4xIIIIIBBBBHHHHHH')
+# A whole page, for decoding every header in one iter_unpack pass
+PAGE_RECORD = struct.Struct(f'{PAGE_HEADER_VALUES.format}{PAGE_SIZE - HEAP_START}x')
+
 TABLE_NAMES = {
     0: "Tracks",
     1: "Genres",
@@ -60,7 +76,7 @@ class TablePointer:
     last_page: int
 
 
-@dataclass
+@dataclass(slots=True)
 class PageHeader:
     page_index: int
     table_type: int
@@ -79,7 +95,7 @@ class PageHeader:
     unknown7: int
 
 
-@dataclass
+@dataclass(slots=True)
 class RowGroup:
     offsets: List[int]
     flags: int
@@ -102,17 +118,25 @@ class PDBValidator:
         self.data = data
         self.filename = filename
         self.errors: List[ValidationError] = []
+        # The same findings split by severity as they are recorded
+        self.errors_by_severity: Dict[str, List[ValidationError]] = {"ERROR": [], "WARNING": [], "INFO": []}
         self.header: Optional[FileHeader] = None
         self.pages: Dict[int, PageHeader] = {}
+        self._page_headers: Optional[List[PageHeader]] = None
+
+    def add(self, severity: str, category: str, message: str, page: Optional[int] = None):
+        e = ValidationError(severity, category, message, page)
+        self.errors.append(e)
+        self.errors_by_severity[severity].append(e)
 
     def error(self, category: str, message: str, page: Optional[int] = None):
-        self.errors.append(ValidationError("ERROR", category, message, page))
+        self.add("ERROR", category, message, page)
 
     def warning(self, category: str, message: str, page: Optional[int] = None):
-        self.errors.append(ValidationError("WARNING", category, message, page))
+        self.add("WARNING", category, message, page)
 
     def info(self, category: str, message: str, page: Optional[int] = None):
-        self.errors.append(ValidationError("INFO", category, message, page))
+        self.add("INFO", category, message, page)
 
     def parse_header(self) -> Optional[FileHeader]:
         """Parse file header (page 0)"""
@@ -120,27 +144,19 @@ class PDBValidator:
             self.error("Header", "File too small for header page")
             return None
 
-        page_size = struct.unpack_from('<I', self.data, 0x04)[0]
-        num_tables = struct.unpack_from('<I', self.data, 0x08)[0]
-        next_unused = struct.unpack_from('<I', self.data, 0x0c)[0]
-        unknown1 = struct.unpack_from('<I', self.data, 0x10)[0]
-        sequence = struct.unpack_from('<I', self.data, 0x14)[0]
-        gap = struct.unpack_from('<I', self.data, 0x18)[0]
-
-        tables = []
-        for i in range(num_tables):
-            offset = 0x1c + i * 16
-            table_type = struct.unpack_from('<I', self.data, offset)[0]
-            empty_candidate = struct.unpack_from('<I', self.data, offset + 4)[0]
-            first_page = struct.unpack_from('<I', self.data, offset + 8)[0]
-            last_page = struct.unpack_from('<I', self.data, offset + 12)[0]
-            tables.append(TablePointer(
+        page_size, num_tables, next_unused, unknown1, sequence, gap = FILE_HEADER.unpack_from(self.data)
+
+        table_area = self.data[FILE_HEADER.size:FILE_HEADER.size + num_tables * TABLE_POINTER.size]
+        tables = [
+            TablePointer(
                 type_id=table_type,
                 name=TABLE_NAMES.get(table_type, f"Unknown({table_type})"),
                 empty_candidate=empty_candidate,
                 first_page=first_page,
                 last_page=last_page,
-            ))
+            )
+            for table_type, empty_candidate, first_page, last_page in TABLE_POINTER.iter_unpack(table_area)
+        ]
 
         return FileHeader(
             page_size=page_size,
@@ -152,64 +168,26 @@ class PDBValidator:
             tables=tables,
         )
 
-    def parse_page_header(self, page_idx: int) -> Optional[PageHeader]:
-        """Parse a page header"""
-        offset = page_idx * PAGE_SIZE
-        if offset + PAGE_SIZE > len(self.data):
-            return None
+    def page_header(self, page_idx: int) -> Optional[PageHeader]:
+        """Page header of page_idx, shared by all validations
 
-        page = self.data[offset:offset + PAGE_SIZE]
-
-        return PageHeader(
-            page_index=struct.unpack_from('<I', page, 0x04)[0],
-            table_type=struct.unpack_from('<I', page, 0x08)[0],
-            next_page=struct.unpack_from('<I', page, 0x0c)[0],
-            unknown1=struct.unpack_from('<I', page, 0x10)[0],
-            unknown2=struct.unpack_from('<I', page, 0x14)[0],
-            num_rows_small=page[0x18],
-            unknown3=page[0x19],
-            unknown4=page[0x1a],
-            page_flags=page[0x1b],
-            free_size=struct.unpack_from('<H', page, 0x1c)[0],
-            used_size=struct.unpack_from('<H', page, 0x1e)[0],
-            unknown5=struct.unpack_from('<H', page, 0x20)[0],
-            num_rows_large=struct.unpack_from('<H', page, 0x22)[0],
-            unknown6=struct.unpack_from('<H', page, 0x24)[0],
-            unknown7=struct.unpack_from('<H', page, 0x26)[0],
-        )
+        The first call decodes the headers of every whole page in the file
+        in a single iter_unpack pass.
+        """
+        if self._page_headers is None:
+            num_pages = len(self.data) // PAGE_SIZE
+            pages = memoryview(self.data)[:num_pages * PAGE_SIZE]
+            self._page_headers = [PageHeader(*fields) for fields in PAGE_RECORD.iter_unpack(pages)]
+        if page_idx < len(self._page_headers):
+            return self._page_headers[page_idx]
+        return None
 
     def parse_row_groups(self, page_data: bytes, num_rows: int) -> List[RowGroup]:
         """Parse row groups from end of page"""
         if num_rows == 0:
             return []
 
-        num_groups = (num_rows + 15) // 16
-        groups = []
-
-        for g in range(num_groups):
-            rows_in_group = min(16, num_rows - g * 16)
-
-            # Group size: rows_in_group * 2 (offsets) + 4 (flags + unknown)
-            group_size = rows_in_group * 2 + 4
-            group_offset = PAGE_SIZE - sum(min(16, num_rows - j * 16) * 2 + 4 for j in range(g + 1))
-
-            if group_offset < 0 or group_offset + group_size > PAGE_SIZE:
-                break
-
-            group = page_data[group_offset:group_offset + group_size]
-
-            # Offsets stored in reverse order within group
-            offsets = []
-            for slot in range(rows_in_group):
-                off = struct.unpack_from('<H', group, (rows_in_group - 1 - slot) * 2)[0]
-                offsets.append(off)
-
-            flags = struct.unpack_from('<H', group, rows_in_group * 2)[0]
-            unknown = struct.unpack_from('<H', group, rows_in_group * 2 + 2)[0]
-
-            groups.append(RowGroup(offsets=offsets, flags=flags, unknown=unknown))
-
-        return groups
+        return [RowGroup(*group) for group in packed_row_groups(page_data, 0, num_rows)]
 
     def validate_file_structure(self):
         """Validate basic file structure"""
@@ -257,7 +235,7 @@ class PDBValidator:
                 visited.add(current)
                 chain.append(current)
 
-                ph = self.parse_page_header(current)
+                ph = self.page_header(current)
                 if not ph:
                     self.error("TableChain", f"{table.name}: Cannot read page {current}")
                     break
@@ -290,15 +268,17 @@ class PDBValidator:
             if chain and chain[-1] != table.last_page:
                 self.warning("TableChain", f"{table.name}: Chain ends at page {chain[-1]} (expected last_page={table.last_page})")
 
-    def validate_page_headers(self):
-        """Validate individual page headers"""
+    def validate_pages(self):
+        """Validate page headers and row groups in a single pass over the pages"""
         if not self.header:
             return
 
         num_pages = len(self.data) // PAGE_SIZE
+        # Pages are windows on the file, not copies
+        view = memoryview(self.data)
 
         for page_idx in range(1, num_pages):  # Skip page 0 (file header)
-            ph = self.parse_page_header(page_idx)
+            ph = self.page_header(page_idx)
             if not ph:
                 continue
 
@@ -306,105 +286,95 @@ class PDBValidator:
             if ph.page_index == 0 and ph.table_type == 0 and ph.next_page == 0 and ph.page_flags == 0:
                 continue
 
-            table_name = TABLE_NAMES.get(ph.table_type, f"Type{ph.table_type}")
-
-            # Validate page_flags
-            valid_flags = {0x24, 0x34, 0x44, 0x64}
-            if ph.page_flags not in valid_flags:
-                self.warning("PageHeader", f"Unusual page_flags 0x{ph.page_flags:02x}", page_idx)
-
-            # Data pages (0x24, 0x34) should have valid row counts
-            if ph.page_flags in {0x24, 0x34}:
-                num_rows = ph.num_rows_small
-
-                # num_rows_large relationship
-                # For normal pages: num_rows_large = num_rows - 1 (or 0 when num_rows <= 1)
-                # For pages with 8191: this is a special marker
-                if ph.num_rows_large == 0x1fff:  # 8191
-                    self.info("PageHeader", f"{table_name}: num_rows_large=8191 (special marker)", page_idx)
-                elif num_rows > 1 and ph.num_rows_large != num_rows - 1:
-                    self.warning("PageHeader", f"{table_name}: num_rows_large={ph.num_rows_large} (expected {num_rows - 1})", page_idx)
-
-                # Validate free_size + used_size
-                available_space = PAGE_SIZE - HEAP_START
-                # Row groups take space at the end
-                num_groups = (num_rows + 15) // 16
-                row_group_space = 0
-                for g in range(num_groups):
-                    rows_in_group = min(16, num_rows - g * 16)
-                    row_group_space += rows_in_group * 2 + 4
-
-                usable_space = available_space - row_group_space
-
-                if ph.free_size + ph.used_size != usable_space and num_rows > 0:
-                    # Allow some slack for alignment
-                    diff = abs((ph.free_size + ph.used_size) - usable_space)
-                    if diff > 4:
-                        self.warning("PageHeader", f"{table_name}: free_size({ph.free_size}) + used_size({ph.used_size}) = {ph.free_size + ph.used_size} (expected ~{usable_space})", page_idx)
-
-    def validate_row_groups(self):
-        """Validate row group structures"""
-        if not self.header:
-            return
-
-        num_pages = len(self.data) // PAGE_SIZE
-
-        for page_idx in range(1, num_pages):
-            ph = self.parse_page_header(page_idx)
-            if not ph or ph.page_flags not in {0x24, 0x34}:
-                continue
-
-            num_rows = ph.num_rows_small
-            if num_rows == 0:
-                continue
-
-            offset = page_idx * PAGE_SIZE
-            page_data = self.data[offset:offset + PAGE_SIZE]
+            self.validate_page_header(page_idx, ph)
 
-            groups = self.parse_row_groups(page_data, num_rows)
-            table_name = TABLE_NAMES.get(ph.table_type, f"Type{ph.table_type}")
+            if ph.page_flags in DATA_PAGE_FLAGS and ph.num_rows_small:
+                offset = page_idx * PAGE_SIZE
+                self.validate_row_groups(page_idx, ph, view[offset:offset + PAGE_SIZE])
 
-            total_present = 0
-            for g_idx, group in enumerate(groups):
-                rows_in_group = len(group.offsets)
+    def validate_page_header(self, page_idx: int, ph: PageHeader):
+        """Validate one page header"""
+        table_name = TABLE_NAMES.get(ph.table_type, f"Type{ph.table_type}")
 
-                # Count present bits
-                present_count = bin(group.flags).count('1')
-                total_present += present_count
+        # Validate page_flags
+        if ph.page_flags not in VALID_PAGE_FLAGS:
+            self.warning("PageHeader", f"Unusual page_flags 0x{ph.page_flags:02x}", page_idx)
 
-                # Validate flags matches row count
-                expected_flags = (1 << rows_in_group) - 1
-                if group.flags != expected_flags:
-                    self.warning("RowGroup", f"{table_name}: Group {g_idx} flags=0x{group.flags:04x} (expected 0x{expected_flags:04x} for {rows_in_group} rows)", page_idx)
-
-                # Validate unknown field
-                # Full groups (16 rows, flags=0xffff) have unknown=0
-                # Partial groups have unknown = 2^(highest_set_bit)
-                if group.flags == 0xffff:
-                    expected_unknown = 0
-                elif group.flags == 0:
-                    expected_unknown = 0
-                else:
-                    highest_bit = group.flags.bit_length() - 1
-                    expected_unknown = 1 << highest_bit
-
-                if group.unknown != expected_unknown:
-                    self.warning("RowGroup", f"{table_name}: Group {g_idx} unknown=0x{group.unknown:04x} (expected 0x{expected_unknown:04x})", page_idx)
-
-                # Validate row offsets are within heap
-                for slot, offset_val in enumerate(group.offsets):
-                    if offset_val >= ph.used_size:
-                        self.warning("RowGroup", f"{table_name}: Group {g_idx} slot {slot} offset 0x{offset_val:04x} >= used_size {ph.used_size}", page_idx)
+        # Data pages (0x24, 0x34) should have valid row counts
+        if ph.page_flags in DATA_PAGE_FLAGS:
+            num_rows = ph.num_rows_small
 
-            if total_present != num_rows:
-                self.warning("RowGroup", f"{table_name}: Total present rows {total_present} != num_rows_small {num_rows}", page_idx)
+            # num_rows_large relationship
+            # For normal pages: num_rows_large = num_rows - 1 (or 0 when num_rows <= 1)
+            # For pages with 8191: this is a special marker
+            if ph.num_rows_large == 0x1fff:  # 8191
+                self.info("PageHeader", f"{table_name}: num_rows_large=8191 (special marker)", page_idx)
+            elif num_rows > 1 and ph.num_rows_large != num_rows - 1:
+                self.warning("PageHeader", f"{table_name}: num_rows_large={ph.num_rows_large} (expected {num_rows - 1})", page_idx)
+
+            # Validate free_size + used_size
+            available_space = PAGE_SIZE - HEAP_START
+            # Row groups take space at the end
+            num_groups = (num_rows + 15) // 16
+            row_group_space = 0
+            for g in range(num_groups):
+                rows_in_group = min(16, num_rows - g * 16)
+                row_group_space += rows_in_group * 2 + 4
+
+            usable_space = available_space - row_group_space
+
+            if ph.free_size + ph.used_size != usable_space and num_rows > 0:
+                # Allow some slack for alignment
+                diff = abs((ph.free_size + ph.used_size) - usable_space)
+                if diff > 4:
+                    self.warning("PageHeader", f"{table_name}: free_size({ph.free_size}) + used_size({ph.used_size}) = {ph.free_size + ph.used_size} (expected ~{usable_space})", page_idx)
+
+    def validate_row_groups(self, page_idx: int, ph: PageHeader, page_data: bytes):
+        """Validate the row group structures of one data page"""
+        num_rows = ph.num_rows_small
+        groups = self.parse_row_groups(page_data, num_rows)
+        table_name = TABLE_NAMES.get(ph.table_type, f"Type{ph.table_type}")
+
+        total_present = 0
+        for g_idx, group in enumerate(groups):
+            rows_in_group = len(group.offsets)
+
+            # Count present bits
+            present_count = group.flags.bit_count()
+            total_present += present_count
+
+            # Validate flags matches row count
+            expected_flags = (1 << rows_in_group) - 1
+            if group.flags != expected_flags:
+                self.warning("RowGroup", f"{table_name}: Group {g_idx} flags=0x{group.flags:04x} (expected 0x{expected_flags:04x} for {rows_in_group} rows)", page_idx)
+
+            # Validate unknown field
+            # Full groups (16 rows, flags=0xffff) have unknown=0
+            # Partial groups have unknown = 2^(highest_set_bit)
+            if group.flags == 0xffff:
+                expected_unknown = 0
+            elif group.flags == 0:
+                expected_unknown = 0
+            else:
+                highest_bit = group.flags.bit_length() - 1
+                expected_unknown = 1 << highest_bit
+
+            if group.unknown != expected_unknown:
+                self.warning("RowGroup", f"{table_name}: Group {g_idx} unknown=0x{group.unknown:04x} (expected 0x{expected_unknown:04x})", page_idx)
+
+            # Validate row offsets are within heap
+            for slot, offset_val in enumerate(group.offsets):
+                if offset_val >= ph.used_size:
+                    self.warning("RowGroup", f"{table_name}: Group {g_idx} slot {slot} offset 0x{offset_val:04x} >= used_size {ph.used_size}", page_idx)
+
+        if total_present != num_rows:
+            self.warning("RowGroup", f"{table_name}: Total present rows {total_present} != num_rows_small {num_rows}", page_idx)
 
     def validate_all(self):
         """Run all validations"""
         self.validate_file_structure()
         self.validate_table_chains()
-        self.validate_page_headers()
-        self.validate_row_groups()
+        self.validate_pages()
 
     def print_summary(self):
         """Print validation summary"""
@@ -420,9 +390,9 @@ class PDBValidator:
             print(f"sequence: {self.header.sequence}")
 
         # Count by severity
-        errors = [e for e in self.errors if e.severity == "ERROR"]
-        warnings = [e for e in self.errors if e.severity == "WARNING"]
-        infos = [e for e in self.errors if e.severity == "INFO"]
+        errors = self.errors_by_severity["ERROR"]
+        warnings = self.errors_by_severity["WARNING"]
+        infos = self.errors_by_severity["INFO"]
 
         print(f"\nResults: {len(errors)} errors, {len(warnings)} warnings, {len(infos)} info")
 
@@ -468,14 +438,12 @@ def compare_pdbs(file1: bytes, file2: bytes, name1: str, name2: str):
     num_pages = min(len(file1), len(file2)) // PAGE_SIZE
     different_pages = []
 
-    for page_idx in range(num_pages):
+    # Identical runs of pages are skipped with one memcmp; differing pages are
+    # counted a machine word at a time
+    for page_idx in sorted(differing_pages(file1, file2, num_pages)):
         off = page_idx * PAGE_SIZE
-        p1 = file1[off:off + PAGE_SIZE]
-        p2 = file2[off:off + PAGE_SIZE]
-
-        if p1 != p2:
-            diff_count = sum(1 for a, b in zip(p1, p2) if a != b)
-            different_pages.append((page_idx, diff_count))
+        diff_count = len(byte_diffs(file1[off:off + PAGE_SIZE], file2[off:off + PAGE_SIZE]))
+        different_pages.append((page_idx, diff_count))
 
     print(f"\nPage differences: {len(different_pages)} of {num_pages} pages differ")
 
@@ -493,6 +461,14 @@ def compare_pdbs(file1: bytes, file2: bytes, name1: str, name2: str):
         print(f"  ... and {len(different_pages) - 20} more pages")
 
 
+def load_pdb(path):
+    """Map a PDB for validation; an empty file is validated as empty bytes"""
+    try:
+        return open_pdb(path, MADV_SEQUENTIAL)
+    except ValueError:
+        return b''
+
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: pdb_validator.py <file.pdb> [file2.pdb] [-v]")
@@ -501,24 +477,22 @@ def main():
 
     files = [arg for arg in sys.argv[1:] if not arg.startswith('-')]
 
-    # Validate first file
-    path1 = Path(files[0])
-    data1 = path1.read_bytes()
+    # Every validation pass walks the whole file front to back
+    paths = [Path(f) for f in files[:2]]
+    validators = [PDBValidator(load_pdb(path), str(path)) for path in paths]
 
-    validator = PDBValidator(data1, str(path1))
-    validator.validate_all()
-    is_valid = validator.print_summary()
+    # Validate both files concurrently so their page-ins overlap; the
+    # reports are still printed in order afterwards
+    with ThreadPoolExecutor(max_workers=len(validators)) as pool:
+        list(pool.map(PDBValidator.validate_all, validators))
 
-    # If second file provided, compare them
-    if len(files) >= 2:
-        path2 = Path(files[1])
-        data2 = path2.read_bytes()
+    is_valid = validators[0].print_summary()
 
-        validator2 = PDBValidator(data2, str(path2))
-        validator2.validate_all()
-        validator2.print_summary()
+    # If second file provided, compare them
+    if len(validators) >= 2:
+        validators[1].print_summary()
 
-        compare_pdbs(data1, data2, str(path1), str(path2))
+        compare_pdbs(validators[0].data, validators[1].data, str(paths[0]), str(paths[1]))
 
     sys.exit(0 if is_valid else 1)
 
@@ -7,124 +7,68 @@ Validates that all IDs referenced in tracks exist in their respective tables.
 
 import struct
 import sys
-from pathlib import Path
+
+from _pdb_common import open_pdb, packed_row_groups, read_u32
 
 PAGE_SIZE = 4096
 HEAP_START = 0x28
 
+# Track row reference IDs: artwork 0x1c, key 0x20, label 0x28, genre 0x3c, album 0x40, artist 0x44
+TRACK_REFS = struct.Struct('<28xII4xI16xIII')
+TRACK_REF_KEYS = ('artwork_ids', 'key_ids', 'label_ids', 'genre_ids', 'album_ids', 'artist_ids')
 
-def get_row_offsets(page_data, num_rows):
-    """Get row offsets from page footer"""
-    if num_rows == 0:
-        return []
-
-    num_groups = (num_rows + 15) // 16
-    footer_size = 0
-    for g in range(num_groups):
-        rows_in_group = min(16, num_rows - g * 16)
-        footer_size += rows_in_group * 2 + 4
-
-    footer_start = PAGE_SIZE - footer_size
-    footer = page_data[footer_start:]
-
-    offsets = []
-    pos = 0
-    for g in range(num_groups - 1, -1, -1):
-        rows_in_group = min(16, num_rows - g * 16)
-        for slot in range(rows_in_group - 1, -1, -1):
-            off = struct.unpack('<H', footer[pos:pos+2])[0]
-            offsets.append((g * 16 + slot, off))
-            pos += 2
-        pos += 4
 
-    offsets.sort()
-    return [off for _, off in offsets]
-
-
-def read_simple_table_ids(data, first_page, last_page, id_offset=0):
-    """Read IDs from a simple table (Genres, Artists, Albums, Keys)"""
-    ids = set()
+def table_pages(data, first_page, last_page):
+    """Follow a table's page chain, yielding (page_data, row_offsets) per data page"""
+    # Pages are windows on the file, not copies
+    view = memoryview(data)
     current_page = first_page
 
     while current_page <= last_page:
         page_start = current_page * PAGE_SIZE
-        page_data = data[page_start:page_start + PAGE_SIZE]
+        page_data = view[page_start:page_start + PAGE_SIZE]
 
         # Check page flags
         page_flags = page_data[0x1b]
         if page_flags == 0x64:  # Header page
-            current_page = struct.unpack('<I', page_data[0x0c:0x10])[0]
+            current_page = read_u32(page_data, 0x0c)
             continue
 
         num_rows = page_data[0x18]
         if num_rows == 0:
             break
 
-        offsets = get_row_offsets(page_data, num_rows)
+        yield page_data, [off for offsets, _, _ in packed_row_groups(page_data, 0, num_rows)
+                          for off in offsets]
 
-        for off in offsets:
-            row_start = HEAP_START + off
-            # For simple tables, ID is at the start of the row
-            row_id = struct.unpack('<I', page_data[row_start + id_offset:row_start + id_offset + 4])[0]
-            ids.add(row_id)
-
-        next_page = struct.unpack('<I', page_data[0x0c:0x10])[0]
+        next_page = read_u32(page_data, 0x0c)
         if next_page == current_page or next_page >= len(data) // PAGE_SIZE:
             break
         current_page = next_page
 
-    return ids
+
+def read_simple_table_ids(data, first_page, last_page, id_offset=0):
+    """Read IDs from a simple table (Genres, Artists, Albums, Keys)"""
+    # For simple tables, ID is at the start of the row
+    return {read_u32(page_data, HEAP_START + off + id_offset)
+            for page_data, offsets in table_pages(data, first_page, last_page)
+            for off in offsets}
 
 
 def read_track_refs(data, first_page, last_page):
     """Read all ID references from tracks"""
-    refs = {
-        'artist_ids': set(),
-        'album_ids': set(),
-        'genre_ids': set(),
-        'key_ids': set(),
-        'label_ids': set(),
-        'artwork_ids': set(),
-    }
-
-    current_page = first_page
-
-    while current_page <= last_page:
-        page_start = current_page * PAGE_SIZE
-        page_data = data[page_start:page_start + PAGE_SIZE]
-
-        page_flags = page_data[0x1b]
-        if page_flags == 0x64:
-            current_page = struct.unpack('<I', page_data[0x0c:0x10])[0]
-            continue
-
-        num_rows = page_data[0x18]
-        if num_rows == 0:
-            break
-
-        offsets = get_row_offsets(page_data, num_rows)
-
-        for off in offsets:
-            row = page_data[HEAP_START + off:]
-
-            refs['artist_ids'].add(struct.unpack('<I', row[0x44:0x48])[0])
-            refs['album_ids'].add(struct.unpack('<I', row[0x40:0x44])[0])
-            refs['genre_ids'].add(struct.unpack('<I', row[0x3c:0x40])[0])
-            refs['key_ids'].add(struct.unpack('<I', row[0x20:0x24])[0])
-            refs['label_ids'].add(struct.unpack('<I', row[0x28:0x2c])[0])
-            refs['artwork_ids'].add(struct.unpack('<I', row[0x1c:0x20])[0])
-
-        next_page = struct.unpack('<I', page_data[0x0c:0x10])[0]
-        if next_page == current_page or next_page >= len(data) // PAGE_SIZE:
-            break
-        current_page = next_page
+    rows = [TRACK_REFS.unpack_from(page_data, HEAP_START + off)
+            for page_data, offsets in table_pages(data, first_page, last_page)
+            for off in offsets]
 
-    return refs
+    # One column per referenced table, turned into a set in a single call
+    columns = list(zip(*rows)) or [()] * len(TRACK_REF_KEYS)
+    return dict(zip(TRACK_REF_KEYS, map(set, columns)))
 
 
 def check_xrefs(path):
     """Check cross-reference integrity"""
-    data = Path(path).read_bytes()
+    data = open_pdb(path)
 
     print(f"Checking: {path}")
     print(f"Size: {len(data)} bytes ({len(data) // PAGE_SIZE} pages)")
@@ -134,8 +78,8 @@ def check_xrefs(path):
     def get_table_info(table_idx):
         offset = 0x1c + table_idx * 16
         return {
-            'first': struct.unpack('<I', data[offset + 8:offset + 12])[0],
-            'last': struct.unpack('<I', data[offset + 12:offset + 16])[0],
+            'first': read_u32(data, offset + 8),
+            'last': read_u32(data, offset + 12),
         }
 
     tracks = get_table_info(0)
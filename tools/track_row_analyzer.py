@@ -3,15 +3,17 @@
 Track Row Analyzer - Parse and compare track rows in PDB files
 """
 
-import struct
+import io
 import sys
 from pathlib import Path
 
+from _pdb_common import build_struct, open_pdb
+
 PAGE_SIZE = 4096
 HEAP_START = 0x28
 
 # Track row field definitions (offset from row start, size, name)
-TRACK_FIELDS = [
+TRACK_FIELDS = (
     (0x00, 2, "subtype"),
     (0x02, 2, "index_shift"),
     (0x04, 4, "bitmask"),
@@ -43,75 +45,121 @@ TRACK_FIELDS = [
     (0x59, 1, "rating"),
     (0x5a, 2, "file_type"),
     (0x5c, 2, "u7"),
-]
+)
+
+# The whole fixed part of the row (0x00..0x5e) in one Struct
+TRACK_ROW = build_struct([(off, {1: 'B', 2: 'H', 4: 'I'}[size], name) for off, size, name in TRACK_FIELDS], 0x5e)
+
+# Comparison table line per field size (name, value 1, value 2, diff marker)
+FIELD_LINE_FORMATS = {
+    1: "{:<20} 0x{:02x}           0x{:02x}           {}",
+    2: "{:<20} 0x{:04x}         0x{:04x}         {}",
+    4: "{:<20} 0x{:08x}     0x{:08x}     {}",
+}
 
 
 def parse_track_row(data, offset):
-    """Parse a track row and return field values"""
-    result = {}
-    for field_offset, size, name in TRACK_FIELDS:
-        pos = offset + field_offset
-        if size == 1:
-            result[name] = data[pos]
-        elif size == 2:
-            result[name] = struct.unpack_from('<H', data, pos)[0]
-        elif size == 4:
-            result[name] = struct.unpack_from('<I', data, pos)[0]
-    return result
-
-
-def compare_track_rows(data1, data2, page_idx, row_offset):
-    """Compare track rows and show differences"""
-    offset1 = page_idx * PAGE_SIZE + HEAP_START + row_offset
-    offset2 = page_idx * PAGE_SIZE + HEAP_START + row_offset
-
-    fields1 = parse_track_row(data1, offset1)
-    fields2 = parse_track_row(data2, offset2)
-
-    print(f"\n{'Field':<20} {'File1':<15} {'File2':<15} {'Diff?'}")
-    print("=" * 60)
-
-    differences = []
-    for field_offset, size, name in TRACK_FIELDS:
-        v1 = fields1[name]
-        v2 = fields2[name]
-        diff = "***" if v1 != v2 else ""
-        if v1 != v2:
-            differences.append((name, v1, v2, field_offset))
-
-        if size == 4:
-            print(f"{name:<20} 0x{v1:08x}     0x{v2:08x}     {diff}")
-        elif size == 2:
-            print(f"{name:<20} 0x{v1:04x}         0x{v2:04x}         {diff}")
-        else:
-            print(f"{name:<20} 0x{v1:02x}           0x{v2:02x}           {diff}")
+    """Parse a track row and return its field values in TRACK_FIELDS order"""
+    return TRACK_ROW.unpack_from(data, offset)
+
+
+def compare_track_rows(data1, data2, page_idx, row_offsets, out=sys.stdout, verbose=True):
+    """Compare track rows at row_offsets on one page and show differences
+
+    Returns the list of differing fields for each row offset.
+    """
+    # Views on the two whole files, set up once for all rows; nothing is copied.
+    # Rows are sliced from the file rather than the page so that a row
+    # reaching past the page end still reads the bytes that follow it.
+    base = page_idx * PAGE_SIZE + HEAP_START
+    view1 = memoryview(data1)
+    view2 = memoryview(data2)
+
+    # When the bytes covering every requested row match, every row does; one
+    # memcmp then stands in for the per-row checks
+    end = base + max(row_offsets) + TRACK_ROW.size
+    page_identical = len(row_offsets) > 1 and data1[base:end] == data2[base:end]
+
+    results = {}
+    for row_offset in row_offsets:
+        if len(row_offsets) > 1:
+            print(f"\n--- Row offset 0x{row_offset:04x} ---", file=out)
+        row_start = base + row_offset
+        results[row_offset] = compare_track_row(view1[row_start:row_start + TRACK_ROW.size],
+                                                view2[row_start:row_start + TRACK_ROW.size],
+                                                page_identical, out, verbose)
+    return results
+
+
+def compare_track_row(row1, row2, identical=False, out=sys.stdout, verbose=True):
+    """Compare the fixed part of two track rows and show differences
+
+    identical says the caller already knows the rows are byte-identical.
+    With verbose off only the differing fields are listed.
+    """
+    fields1 = parse_track_row(row1, 0)
+    # Byte-identical rows (the common case for near-identical exports) are
+    # parsed only once; the views compare without copying
+    fields2 = fields1 if identical or row1 == row2 else parse_track_row(row2, 0)
+
+    if not verbose:
+        # Differences only: no per-field formatting, and nothing to do at all
+        # for identical rows
+        differences = [] if fields2 is fields1 else [
+            (name, v1, v2, field_offset)
+            for (field_offset, _, name), v1, v2 in zip(TRACK_FIELDS, fields1, fields2) if v1 != v2
+        ]
+    else:
+        print(f"\n{'Field':<20} {'File1':<15} {'File2':<15} {'Diff?'}", file=out)
+        print("=" * 60, file=out)
+
+        differences = []
+        add_difference = differences.append
+        for (field_offset, size, name), v1, v2 in zip(TRACK_FIELDS, fields1, fields2):
+            diff = ""
+            if v1 != v2:
+                diff = "***"
+                add_difference((name, v1, v2, field_offset))
+
+            print(FIELD_LINE_FORMATS[size].format(name, v1, v2, diff), file=out)
 
     if differences:
-        print(f"\n{len(differences)} field(s) differ:")
+        print(f"\n{len(differences)} field(s) differ:", file=out)
         for name, v1, v2, off in differences:
-            print(f"  {name} (row offset 0x{off:02x}): {v1} vs {v2}")
+            print(f"  {name} (row offset 0x{off:02x}): {v1} vs {v2}", file=out)
 
     return differences
 
 
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: track_row_analyzer.py <file1.pdb> <file2.pdb> [page] [row_offset]")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('-')]
+    if len(args) < 2:
+        print("Usage: track_row_analyzer.py <file1.pdb> <file2.pdb> [page] [row_offset...] [-q]")
+        print("  -q: only list the fields that differ")
         sys.exit(1)
 
-    path1 = Path(sys.argv[1])
-    path2 = Path(sys.argv[2])
-    page_idx = int(sys.argv[3]) if len(sys.argv) > 3 else 2
-    row_offset = int(sys.argv[4], 0) if len(sys.argv) > 4 else 0
-
-    data1 = path1.read_bytes()
-    data2 = path2.read_bytes()
-
-    print(f"Comparing track row at page {page_idx}, row offset 0x{row_offset:04x}")
+    path1 = Path(args[0])
+    path2 = Path(args[1])
+    page_idx = int(args[2]) if len(args) > 2 else 2
+    row_offsets = [int(arg, 0) for arg in args[3:]] or [0]
+    verbose = "-q" not in sys.argv
+
+    # Only the page holding the rows is ever read
+    data1 = open_pdb(path1, hint_pages=(page_idx,))
+    data2 = open_pdb(path2, hint_pages=(page_idx,))
+
+    offsets_desc = ", ".join(f"0x{off:04x}" for off in row_offsets)
+    if len(row_offsets) > 1:
+        print(f"Comparing track rows at page {page_idx}, row offsets {offsets_desc}")
+    else:
+        print(f"Comparing track row at page {page_idx}, row offset {offsets_desc}")
     print(f"File 1: {path1}")
     print(f"File 2: {path2}")
 
-    compare_track_rows(data1, data2, page_idx, row_offset)
+    # The comparison is built in memory and written with one call
+    out = io.StringIO()
+    compare_track_rows(data1, data2, page_idx, row_offsets, out, verbose)
+    sys.stdout.write(out.getvalue())
 
 
 if __name__ == '__main__':